@@ -0,0 +1,206 @@
+import re
+import threading
+from cache import split_segment
+from metrics import stage
+from segmenter import PLACEHOLDER_RE, same_placeholders
+
+# Argos Translate (y CTranslate2 y SentencePiece, que instala con él) es opcional: solo hace falta
+# para traducir en el propio proceso con ArgosBackend
+try:
+    import ctranslate2
+    import sentencepiece
+    from argostranslate import package as argos_package
+except ImportError:
+    ctranslate2 = None
+
+# Separación entre frases (se conserva el espacio o salto de línea que las separa)
+SENTENCE_RE = re.compile(r'(?<=[.!?…])(\s+)')
+
+# Error lanzado cuando el motor de traducción no devuelve una respuesta válida
+# retryable indica si merece la pena reintentar (servidor caído, sobrecargado o lento) y
+# unreachable si el servidor ni siquiera ha respondido (error de conexión o timeout)
+class TranslationError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None, unreachable=False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.unreachable = unreachable
+
+# Interfaz común de los motores de traducción
+# Cada motor implementa translate_segments(segments, source, target, fmt), que recibe segmentos ya
+# normalizados y sin repetir y devuelve {segmento: traducción}. TranslationBackend se encarga del
+# resto: separar los espacios de los extremos, quitar los segmentos repetidos, consultar y
+# actualizar la memoria de traducción (cache.TranslationMemory) y anotar las métricas (metrics.Metrics)
+class TranslationBackend:
+    def __init__(self, cache=None, metrics=None):
+        self.cache = cache
+        self.metrics = metrics
+
+    def translate_segments(self, segments, source, target, fmt):
+        raise NotImplementedError
+
+    # Función para traducir un texto; lanza TranslationError si el motor no lo consigue traducir
+    def translate_text(self, text, source, target, fmt="html"):
+        return self.translate_batch([text], source, target, fmt)[0]
+
+    # Función para traducir varios textos a la vez
+    # Cada segmento distinto se consulta primero en la memoria de traducción y solo los que faltan
+    # se envían al motor; las traducciones se devuelven en el mismo orden que los textos
+    def translate_batch(self, texts, source, target, fmt="html"):
+        with stage(self.metrics, 'translate_batch', target=target, segments=len(texts)) as fields:
+            # Separar los espacios de los extremos y quedarse con un único ejemplar de cada segmento
+            parts = [split_segment(text) for text in texts]
+            unique = list(dict.fromkeys(core for _, core, _ in parts if core))
+
+            translations = {}
+            if self.cache is not None:
+                with stage(self.metrics, 'cache_lookup', segments=len(unique)):
+                    translations = self.cache.get_many(unique, source, target, fmt)
+            missing = [core for core in unique if core not in translations]
+            fields.update(unique=len(unique), cache_hits=len(translations), missing=len(missing))
+            if self.metrics is not None:
+                self.metrics.count('segments_requested', len(texts))
+                self.metrics.count('segments_deduplicated', len(texts) - len(unique))
+                self.metrics.count('cache_hits', len(translations))
+
+            if missing:
+                received = self.translate_segments(missing, source, target, fmt)
+                self.remember(received, source, target, fmt)
+                translations.update(received)
+
+        return [lead + translations[core] + trail if core else text
+                for text, (lead, core, trail) in zip(texts, parts)]
+
+    # Función para guardar en la memoria de traducción {segmento: traducción}
+    # Las traducciones que han perdido o duplicado algún marcador <code>N</code> no se guardan: el
+    # bloque se deja sin traducir (ver post.py) y se vuelve a enviar al motor en la próxima ejecución
+    def remember(self, translations, source, target, fmt):
+        if self.cache is None:
+            return
+        translations = {segment: translation for segment, translation in translations.items()
+                        if same_placeholders(segment, translation)}
+        if translations:
+            self.cache.put_many(translations, source, target, fmt)
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+# Función para traducir un texto de forma determinista, sin modelo: marca el idioma de destino y
+# pasa a mayúsculas el texto, dejando intactos los marcadores <code>N</code>
+# La usan StubBackend y el servidor de pruebas (stub_server.py), así que los dos traducen igual
+def stub_translate(text, source, target):
+    if not text.strip():
+        return text
+    parts = PLACEHOLDER_RE.split(text)
+    # split() deja el texto en las posiciones pares y el número de cada marcador en las impares
+    translated = "".join(part.upper() if i % 2 == 0 else f'<code>{part}</code>' for i, part in enumerate(parts))
+    return f'[{target}] {translated}'
+
+# Motor de pruebas: traduce con stub_translate, sin red ni modelos
+class StubBackend(TranslationBackend):
+    def translate_segments(self, segments, source, target, fmt):
+        return {segment: stub_translate(segment, source, target) for segment in segments}
+
+# Motor que traduce en el propio proceso con los modelos de Argos Translate (los mismos que usa
+# LibreTranslate), sin servidor ni peticiones HTTP. Cada modelo se carga una sola vez con
+# CTranslate2 y todas las frases de un lote se traducen juntas con Translator.translate_batch.
+# Los textos se parten por los marcadores <code>N</code> (que se copian tal cual, así el modelo
+# no los puede alterar) y por frases. Si no hay modelo directo entre dos idiomas se traduce
+# pasando por el inglés. Los modelos se instalan con argospm (p. ej. argospm install translate-es_en)
+class ArgosBackend(TranslationBackend):
+    def __init__(self, cache=None, metrics=None, device="cpu", inter_threads=1, intra_threads=0,
+                 beam_size=2, max_batch_size=32):
+        if ctranslate2 is None:
+            raise ImportError("ArgosBackend necesita Argos Translate: pip install argostranslate")
+        super().__init__(cache, metrics)
+        self.device = device
+        self.inter_threads = inter_threads
+        self.intra_threads = intra_threads
+        self.beam_size = beam_size
+        self.max_batch_size = max_batch_size
+        self.models = {}  # {(origen, destino): (Translator, SentencePieceProcessor)}
+        self.lock = threading.Lock()
+
+    # Función para cargar (una sola vez) el modelo de un par de idiomas
+    def _model(self, source, target):
+        with self.lock:
+            if (source, target) not in self.models:
+                package = next((package for package in argos_package.get_installed_packages()
+                                if package.from_code == source and package.to_code == target), None)
+                if package is None:
+                    self.models[(source, target)] = None
+                else:
+                    translator = ctranslate2.Translator(str(package.package_path / 'model'), device=self.device,
+                                                        inter_threads=self.inter_threads,
+                                                        intra_threads=self.intra_threads)
+                    tokenizer = sentencepiece.SentencePieceProcessor(
+                        model_file=str(package.package_path / 'sentencepiece.model'))
+                    self.models[(source, target)] = (translator, tokenizer)
+            return self.models[(source, target)]
+
+    # Función para obtener los modelos que hay que aplicar para traducir de source a target
+    def _pipeline(self, source, target):
+        model = self._model(source, target)
+        if model is not None:
+            return [model]
+        if source != 'en' and target != 'en':
+            first, second = self._model(source, 'en'), self._model('en', target)
+            if first is not None and second is not None:
+                return [first, second]
+        raise TranslationError(f"No hay ningún modelo de Argos Translate instalado para traducir de {source} a {target}")
+
+    # Función para traducir varias frases con un modelo en una sola llamada
+    def _translate_sentences(self, model, sentences):
+        translator, tokenizer = model
+        with stage(self.metrics, 'model', sentences=len(sentences)):
+            results = translator.translate_batch(tokenizer.encode(sentences, out_type=str),
+                                                 beam_size=self.beam_size, max_batch_size=self.max_batch_size)
+        return [tokenizer.decode(result.hypotheses[0]) for result in results]
+
+    def translate_segments(self, segments, source, target, fmt):
+        pipeline = self._pipeline(source, target)
+
+        # Partir cada segmento en trozos: texto, marcadores y espacios se separan y solo se traducen
+        # las frases; después se vuelven a unir en el mismo orden
+        layouts = []
+        sentences = {}
+        for segment in segments:
+            layout = []
+            for i, part in enumerate(PLACEHOLDER_RE.split(segment)):
+                if i % 2 == 1:
+                    layout.append((False, f'<code>{part}</code>'))
+                    continue
+                for j, piece in enumerate(SENTENCE_RE.split(part)):
+                    lead, core, trail = split_segment(piece)
+                    if j % 2 == 1 or not core:
+                        layout.append((False, piece))
+                    else:
+                        layout += [(False, lead), (True, core), (False, trail)]
+                        sentences[core] = None
+            layouts.append(layout)
+
+        texts = list(sentences)
+        for model in pipeline:
+            texts = self._translate_sentences(model, texts) if texts else texts
+        sentences = dict(zip(sentences, texts))
+
+        return {segment: "".join(sentences[piece] if translate else piece for translate, piece in layout)
+                for segment, layout in zip(segments, layouts)}
+
+# Motores de traducción disponibles
+BACKENDS = ('http', 'argos', 'stub')
+
+# Función para crear un motor de traducción por su nombre
+# 'http' es el cliente de LibreTranslate (client.TranslationClient) y url su dirección o lista de
+# instancias; 'argos' traduce en el propio proceso (ArgosBackend) y 'stub' es el motor de pruebas.
+# options se pasa tal cual al constructor del motor
+def create_backend(name, url=None, cache=None, metrics=None, **options):
+    if name == 'http':
+        from client import TranslationClient  # client.py importa este módulo
+        return TranslationClient(url, cache=cache, metrics=metrics, **options)
+    if name == 'argos':
+        return ArgosBackend(cache, metrics, **options)
+    if name == 'stub':
+        return StubBackend(cache, metrics, **options)
+    raise ValueError(f"Motor de traducción desconocido: {name} (opciones: {', '.join(BACKENDS)})")
@@ -0,0 +1,211 @@
+import argparse
+import contextlib
+import io
+import json
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+import translate
+from backends import BACKENDS
+from content_index import scan_content
+from scheduler import file_segments
+
+# Banco de pruebas del script de traducción
+# Genera un árbol de contenido de Hugo sintético, arranca uno o varios servidores de pruebas
+# (stub_server.py) y traduce el árbol con translate.py para medir archivos/s, segmentos/s,
+# peticiones HTTP por archivo, memoria máxima y latencia por archivo.
+# Uso: python benchmark.py --sections 5 --posts 40 --latency 0.05 --max-in-flight 8
+
+WORDS = ("el servidor de traducción procesa cada bloque del artículo mientras el índice guarda "
+         "la configuración del sitio con los datos de la red y los contenedores que se despliegan "
+         "en la nube para comprobar que el sistema responde rápido").split()
+
+# Función para generar una frase aleatoria de longitud variable
+def sentence(rng, min_words=6, max_words=18):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+# Función para generar un post con front matter, títulos, párrafos, listas, código, imágenes y tablas
+def generate_post(rng, title, paragraphs):
+    lines = ["---", f"title: \"{title}\"", f"description: {sentence(rng)}", "date: 2024-01-01",
+             "tags: [docker, redes]", "---", ""]
+    for number in range(paragraphs):
+        kind = rng.random()
+        if number % 5 == 0:
+            lines += [f"## {sentence(rng, 2, 5)}", ""]
+        if kind < 0.1:
+            lines += ["```bash", "docker run -d -p 5000:5000 libretranslate/libretranslate", "ls -la /etc", "```", ""]
+        elif kind < 0.2:
+            lines += ["- " + sentence(rng, 3, 8) for _ in range(rng.randint(2, 5))] + [""]
+        elif kind < 0.25:
+            lines += [f"![{sentence(rng, 2, 3)}](/img/captura-{number}.png)", ""]
+        elif kind < 0.3:
+            lines += ["| Comando | Descripción |", "|---|---|",
+                      f"| `ls` | {sentence(rng, 3, 6)} |", f"| `cd` | {sentence(rng, 3, 6)} |", ""]
+        else:
+            lines += [f"{sentence(rng)} Ejecuta `systemctl restart nginx` y revisa "
+                      f"[la documentación](https://example.com/docs/{number}). {sentence(rng)}", ""]
+    return "\n".join(lines)
+
+# Función para generar un árbol de contenido con sections secciones de posts posts cada una
+# Cada sección tiene su _index.md y cada post su carpeta con index.md
+def generate_tree(root, sections, posts, paragraphs, seed=0):
+    rng = random.Random(seed)
+    for section in range(sections):
+        section_dir = root / f"seccion-{section}"
+        section_dir.mkdir(parents=True)
+        (section_dir / "_index.md").write_text(
+            f"---\ntitle: \"Sección {section}\"\nmenu:\n  sidebar:\n    name: Sección {section}\n"
+            f"    identifier: seccion-{section}\n    weight: {section}\n---\n", encoding='utf-8')
+        for post in range(posts):
+            post_dir = section_dir / f"post-{post}"
+            post_dir.mkdir()
+            (post_dir / "index.md").write_text(
+                generate_post(rng, f"Post {post} de la sección {section}", paragraphs), encoding='utf-8')
+
+# Función para arrancar un servidor de pruebas y devolver el proceso y su URL
+def start_stub_server(latency, char_latency, error_rate):
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name('stub_server.py')), '--port', '0',
+         '--latency', str(latency), '--char-latency', str(char_latency), '--error-rate', str(error_rate)],
+        stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError("No se ha podido arrancar el servidor de pruebas")
+    return process, url
+
+# Función para leer los contadores de un servidor de pruebas
+def stub_stats(url):
+    with urllib.request.urlopen(url.rsplit('/', 1)[0] + '/stats') as response:
+        return json.load(response)
+
+# Función para contar los segmentos traducibles de los archivos pendientes (uno por bloque e idioma)
+def count_segments(md_files):
+    total = 0
+    for file_path, file_languages in md_files:
+        if file_path.name == "_index.md":
+            continue
+        total += file_segments(file_path) * len(file_languages)
+    return total
+
+# Función para calcular un percentil (0-100) de una lista de valores
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+# Función para traducir el árbol una vez y devolver sus métricas
+# Las peticiones HTTP se cuentan en los servidores de pruebas, por diferencia antes y después
+def run_once(content_dir, urls, verbose=False):
+    requests_before = sum(stub_stats(url)['requests'] for url in urls)
+    content_index = scan_content(content_dir, translate.languages)
+    md_files = translate.list_md_files(content_index, translate.output_languages)
+    segments = count_segments(md_files)
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        durations = translate.translate_files(md_files)
+    elapsed = time.perf_counter() - start
+    translate.manifest.save()
+    translate.journal.compact()
+    requests = sum(stub_stats(url)['requests'] for url in urls) - requests_before
+
+    return {'files': len(md_files), 'translated': len(durations), 'segments': segments,
+            'requests': requests, 'elapsed': elapsed, 'durations': list(durations.values())}
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de translate.py contra un servidor de pruebas")
+    parser.add_argument('--sections', type=int, default=5, help="Secciones (_index.md) del árbol generado")
+    parser.add_argument('--posts', type=int, default=20, help="Posts por sección")
+    parser.add_argument('--paragraphs', type=int, default=30, help="Bloques por post")
+    parser.add_argument('--languages', default='en', help="Idiomas de destino separados por comas")
+    parser.add_argument('--backend', choices=BACKENDS, default='http',
+                        help="Motor de traducción; con 'stub' o 'argos' se traduce en el propio proceso, sin servidores")
+    parser.add_argument('--servers', type=int, default=1, help="Servidores de pruebas entre los que repartir")
+    parser.add_argument('--latency', type=float, default=0.02, help="Segundos de espera por petición")
+    parser.add_argument('--char-latency', type=float, default=0.0, help="Segundos de espera por carácter")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de peticiones que responden 503")
+    parser.add_argument('--max-in-flight', type=int, default=translate.max_in_flight)
+    parser.add_argument('--files-in-flight', type=int, default=translate.max_files_in_flight)
+    parser.add_argument('--batch-char-limit', type=int, default=translate.batch_char_limit)
+    parser.add_argument('--batch-size-limit', type=int, default=translate.batch_size_limit)
+    parser.add_argument('--cache', action='store_true', help="Usar una memoria de traducción (vacía al empezar)")
+    parser.add_argument('--rerun', action='store_true',
+                        help="Traducir otra vez tras modificar un post para medir la ejecución incremental")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help="No borrar el directorio temporal al terminar")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar la salida de translate.py")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='translate-benchmark-'))
+    content_dir = work_dir / 'content'
+    generate_tree(content_dir, args.sections, args.posts, args.paragraphs, args.seed)
+
+    servers = []
+    if args.backend == 'http':
+        servers = [start_stub_server(args.latency, args.char_latency, args.error_rate) for _ in range(args.servers)]
+    urls = [url for _, url in servers]
+
+    # Configurar translate.py para traducir el árbol generado contra los servidores de pruebas
+    translate.input_directory = content_dir
+    translate.output_languages = args.languages.split(',')
+    translate.languages = [translate.input_language, *translate.output_languages]
+    translate.translation_backend = args.backend
+    translate.urls = urls
+    translate.max_in_flight = args.max_in_flight
+    translate.max_files_in_flight = args.files_in_flight
+    translate.batch_char_limit = args.batch_char_limit
+    translate.batch_size_limit = args.batch_size_limit
+    translate.health_check_interval = None
+    translate.cache_path = work_dir / 'translation_memory.sqlite' if args.cache else None
+    translate.manifest_path = work_dir / 'translation_manifest.json'
+    translate.journal_path = work_dir / 'translation_journal.jsonl'
+    translate.trace_path = work_dir / 'translation_trace.jsonl'
+
+    runs = []
+    try:
+        translate.setup()
+        runs.append(('completa', run_once(content_dir, urls, args.verbose)))
+        if args.rerun:
+            post = content_dir / 'seccion-0' / 'post-0' / 'index.md'
+            with open(post, 'a', encoding='utf-8') as file:
+                file.write("\nPárrafo añadido para medir la traducción incremental.\n")
+            runs.append(('incremental', run_once(content_dir, urls, args.verbose)))
+        translate.close()
+    finally:
+        for process, _ in servers:
+            process.kill()
+            process.wait()
+        if not args.keep:
+            shutil.rmtree(work_dir)
+
+    print(f"Árbol: {args.sections} secciones x {args.posts} posts x {args.paragraphs} bloques, "
+          f"idiomas {args.languages}, motor {args.backend}, {len(servers)} servidor(es), latencia {args.latency}s")
+    print(f"Ajustes: max_in_flight={args.max_in_flight}, archivos a la vez={args.files_in_flight}, "
+          f"batch_char_limit={args.batch_char_limit}, batch_size_limit={args.batch_size_limit}, "
+          f"memoria={'sí' if args.cache else 'no'}")
+    for name, run in runs:
+        elapsed = run['elapsed'] or 1e-9
+        files = run['files'] or 1
+        print(f"Ejecución {name}:")
+        print(f"  Archivos: {run['translated']}/{run['files']} en {run['elapsed']:.2f}s "
+              f"({run['translated'] / elapsed:.1f} archivos/s)")
+        print(f"  Segmentos: {run['segments']} ({run['segments'] / elapsed:.1f} segmentos/s)")
+        print(f"  Peticiones HTTP: {run['requests']} ({run['requests'] / files:.2f} por archivo)")
+        print(f"  Latencia por archivo: p50 {percentile(run['durations'], 50) * 1000:.0f} ms, "
+              f"p99 {percentile(run['durations'], 99) * 1000:.0f} ms")
+    translate.metrics.print_summary()
+    # ru_maxrss está en KiB en Linux
+    print(f"Memoria máxima (RSS): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+import time
+import unicodedata
+from hashes import text_hash
+
+# Función para normalizar un segmento antes de calcular su hash
+# Separa los espacios de los extremos (que se conservan fuera de la traducción) del texto en sí
+def split_segment(text):
+    core = text.strip()
+    start = text.index(core) if core else len(text)
+    return text[:start], unicodedata.normalize('NFC', core), text[start + len(core):]
+
+# Memoria de traducción persistente en SQLite
+# Cada entrada se identifica por (idioma origen, idioma destino, formato, hash del segmento);
+# cuando se supera max_entries se eliminan las entradas usadas hace más tiempo
+class TranslationMemory:
+    def __init__(self, path, max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # La conexión se comparte entre los hilos del cliente, protegida por self.lock
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS memory (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                format TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (source, target, format, hash)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS memory_last_used ON memory (last_used)")
+        self.connection.commit()
+
+    # Función para buscar varios segmentos normalizados a la vez
+    # Devuelve un diccionario {texto: traducción} solo con los que están en la memoria
+    def get_many(self, texts, source, target, fmt):
+        hashes = {text_hash(text): text for text in texts}
+
+        with self.lock:
+            found = self._select(hashes, source, target, fmt)
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE memory SET last_used = ? WHERE source = ? AND target = ? AND format = ? AND hash = ?",
+                    [(now, source, target, fmt, text_hash(text)) for text in found]
+                )
+                self.connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    # Función para saber qué segmentos normalizados están en la memoria, sin marcarlos como usados
+    # ni contarlos como aciertos (para planificar una ejecución)
+    def contains_many(self, texts, source, target, fmt):
+        hashes = {text_hash(text): text for text in texts}
+        with self.lock:
+            return set(self._select(hashes, source, target, fmt))
+
+    # Función para buscar en la base de datos los hashes {hash: texto}; devuelve {texto: traducción}
+    def _select(self, hashes, source, target, fmt):
+        found = {}
+        keys = list(hashes)
+        for start in range(0, len(keys), 500):  # SQLite limita el número de parámetros por consulta
+            chunk = keys[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT hash, translation FROM memory WHERE source = ? AND target = ? AND format = ? "
+                f"AND hash IN ({','.join('?' * len(chunk))})",
+                [source, target, fmt, *chunk]
+            ).fetchall()
+            for hash_, translation in rows:
+                found[hashes[hash_]] = translation
+        return found
+
+    # Función para guardar varias traducciones {texto: traducción} y aplicar el límite de tamaño
+    def put_many(self, translations, source, target, fmt):
+        if not translations:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO memory (source, target, format, hash, translation, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(source, target, fmt, text_hash(text), translation, now)
+                 for text, translation in translations.items()]
+            )
+            self._evict()
+            self.connection.commit()
+
+    # Función para eliminar las entradas menos usadas recientemente si se supera max_entries
+    def _evict(self):
+        if not self.max_entries:
+            return
+
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM memory").fetchone()
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM memory WHERE rowid IN (SELECT rowid FROM memory ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    # Función para obtener las estadísticas de uso de la memoria
+    def stats(self):
+        with self.lock:
+            (entries,) = self.connection.execute("SELECT COUNT(*) FROM memory").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
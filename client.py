@@ -0,0 +1,258 @@
+import json
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from backends import TranslationBackend, TranslationError
+from controller import AdaptiveLimiter, CircuitBreaker, backoff_delay
+
+# Función para agrupar los textos en lotes que respeten los límites del servidor
+# Devuelve listas de índices sobre la lista original
+def pack_batches(texts, char_limit, size_limit=None):
+    batches = []
+    current = []
+    current_chars = 0
+
+    for idx, text in enumerate(texts):
+        full = current and current_chars + len(text) > char_limit
+        if size_limit and len(current) >= size_limit:
+            full = True
+        if full:
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(idx)
+        current_chars += len(text)
+
+    if current:
+        batches.append(current)
+    return batches
+
+# Instancia de LibreTranslate a la que el cliente reparte peticiones
+# Cada una tiene su propio límite adaptativo de peticiones en curso y su propio cortocircuito
+class Endpoint:
+    def __init__(self, url, limiter, breaker):
+        self.url = url
+        self.limiter = limiter
+        self.breaker = breaker
+        self.healthy = True  # Lo actualiza la comprobación periódica de /languages
+
+    # Función para saber si se le pueden enviar peticiones
+    def available(self):
+        return self.healthy and self.breaker.available()
+
+# Cliente compartido para la API de LibreTranslate (el motor de traducción 'http', ver backends.py)
+# Reutiliza un requests.Session con un pool de conexiones keep-alive en lugar de abrir
+# una conexión TCP nueva en cada petición. url puede ser una dirección o una lista de instancias
+# de LibreTranslate: cada lote va a la instancia disponible con menos peticiones en curso, y las
+# que fallan o no superan la comprobación periódica de salud dejan de recibir peticiones hasta que
+# se recuperan. Los lotes se envían en paralelo, con como mucho max_in_flight peticiones en curso
+# por instancia; dentro de ese máximo, controller.AdaptiveLimiter ajusta las peticiones en curso a
+# la capacidad real de cada instancia. Los errores de sobrecarga o conexión se reintentan con
+# esperas crecientes. Las respuestas de sobrecarga (429, 503) solo reducen las peticiones en curso;
+# si una instancia no responde (errores de conexión o timeouts), su controller.CircuitBreaker deja
+# de enviarle peticiones un tiempo. Mientras no hay ninguna instancia disponible las peticiones
+# esperan como mucho unavailable_timeout segundos (por defecto, lo que tarda el cortocircuito en
+# volver a probar más una petición de prueba) antes de fallar.
+# Si se indica una memoria de traducción (cache.TranslationMemory) se consulta antes de llamar al servidor.
+# Si se indican métricas (metrics.Metrics) se anota la duración de cada lote y de cada petición HTTP
+class TranslationClient(TranslationBackend):
+    def __init__(self, url, pool_size=10, timeout=(5, 120), api_key="", char_limit=10000, size_limit=None,
+                 max_in_flight=1, cache=None, max_retries=5, retry_base_delay=0.5, retry_max_delay=30,
+                 target_latency=None, breaker_threshold=5, breaker_cooldown=30, health_check_interval=None,
+                 unavailable_timeout=None, metrics=None):
+        super().__init__(cache, metrics)
+        urls = [url] if isinstance(url, str) else list(url)
+        self.timeout = timeout  # (conexión, lectura) en segundos
+        self.api_key = api_key
+        self.char_limit = char_limit
+        self.size_limit = size_limit
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        if unavailable_timeout is None:
+            unavailable_timeout = breaker_cooldown + timeout[0] + timeout[1]
+        self.unavailable_timeout = unavailable_timeout
+
+        # Los límites de todas las instancias comparten una condición para esperar a la primera con hueco
+        self.condition = threading.Condition()
+        self.endpoints = [
+            Endpoint(endpoint_url,
+                     AdaptiveLimiter(max(1, max_in_flight // 2), maximum=max_in_flight,
+                                     target_latency=target_latency, condition=self.condition),
+                     CircuitBreaker(breaker_threshold, breaker_cooldown))
+            for endpoint_url in urls
+        ]
+        workers = max_in_flight * len(self.endpoints)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+
+        # El pool debe admitir al menos una conexión por petición en curso
+        pool_size = max(pool_size, max_in_flight)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.endpoints), 1), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        # Comprobación periódica de la salud de cada instancia
+        self.stopped = threading.Event()
+        if health_check_interval:
+            threading.Thread(target=self._health_check_loop, args=(health_check_interval,),
+                             name="translate-health", daemon=True).start()
+
+    # Función para enviar una petición a /translate; 'q' puede ser un texto o una lista de textos
+    # Reintenta los errores de sobrecarga o conexión (en la misma o en otra instancia) y lanza
+    # TranslationError si no lo consigue
+    def request(self, q, source, target, fmt="html"):
+        payload = json.dumps({
+            "q": q,
+            "source": source,
+            "target": target,
+            "format": fmt,
+            "api_key": self.api_key
+        })
+        segments = len(q) if isinstance(q, list) else 1
+        characters = sum(len(text) for text in q) if isinstance(q, list) else len(q)
+
+        for attempt in range(self.max_retries + 1):
+            endpoint = self._acquire_endpoint()
+            start = time.monotonic()
+            error = None
+            try:
+                result = self._post(endpoint.url, payload)
+            except TranslationError as caught:
+                error = caught
+            finally:
+                # El hueco se libera siempre, también si la petición falla de forma inesperada
+                latency = time.monotonic() - start
+                endpoint.limiter.release(latency, overloaded=error is not None and error.retryable)
+
+            if error is not None:
+                self._record_request(endpoint, latency, segments, characters, attempt,
+                                     'retry' if error.retryable and attempt < self.max_retries else 'error')
+                if error.unreachable:
+                    endpoint.breaker.record_failure()
+                else:
+                    endpoint.breaker.record_success()  # El servidor responde, aunque sea para decir que está ocupado
+                if not error.retryable:
+                    raise error
+                if attempt == self.max_retries:
+                    raise error
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                time.sleep(max(delay, error.retry_after or 0))
+                continue
+
+            self._record_request(endpoint, latency, segments, characters, attempt, 'ok')
+            endpoint.breaker.record_success()
+            return result
+
+    # Función para anotar en las métricas una petición HTTP: latencia, segmentos y caracteres enviados
+    def _record_request(self, endpoint, latency, segments, characters, attempt, status):
+        if self.metrics is None:
+            return
+        self.metrics.record('request', latency, url=endpoint.url, segments=segments, characters=characters,
+                            attempt=attempt, status=status, limit=int(endpoint.limiter.limit))
+        self.metrics.count('http_requests')
+        self.metrics.count('characters_sent', characters)
+        self.metrics.count('segments_sent', segments)
+        if status != 'ok':
+            self.metrics.count('http_errors')
+
+    # Función para elegir la instancia disponible con menos peticiones en curso y ocupar un hueco en ella
+    # Espera si todas las disponibles están al límite. Si no hay ninguna disponible (cortocircuito
+    # abierto o fuera de la comprobación de salud) espera a que alguna se recupere y lanza
+    # TranslationError si pasan unavailable_timeout segundos sin que ocurra
+    def _acquire_endpoint(self):
+        deadline = None
+        with self.condition:
+            while True:
+                available = [endpoint for endpoint in self.endpoints if endpoint.available()]
+                if available:
+                    deadline = None
+                elif deadline is None:
+                    deadline = time.monotonic() + self.unavailable_timeout
+                elif time.monotonic() >= deadline:
+                    raise TranslationError("Ningún servidor de traducción responde, no se envían más peticiones "
+                                           "por ahora")
+
+                for endpoint in sorted(available, key=lambda endpoint: endpoint.limiter.in_flight):
+                    if endpoint.limiter.in_flight < int(endpoint.limiter.limit) and endpoint.breaker.allow():
+                        endpoint.limiter.try_acquire()
+                        return endpoint
+
+                # Se revisa cada segundo por si alguna instancia vuelve a estar disponible
+                self.condition.wait(timeout=1)
+
+    # Función para hacer una única petición HTTP y clasificar sus errores
+    def _post(self, url, payload):
+        try:
+            response = self.session.post(url, data=payload, timeout=self.timeout)
+        except requests.RequestException as error:
+            raise TranslationError(f"No se pudo conectar con {url}: {error}", retryable=True,
+                                   unreachable=True) from error
+
+        if response.status_code != 200:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            retry_after = response.headers.get('Retry-After')
+            raise TranslationError(f"Error con la traducción en {url} ({response.status_code}): {response.text}",
+                                   retryable=retryable,
+                                   retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        try:
+            return response.json()['translatedText']
+        except (ValueError, KeyError, TypeError) as error:
+            raise TranslationError(f"Respuesta no válida de {url}: {response.text[:200]}") from error
+
+    # Función que comprueba cada cierto tiempo que las instancias responden en /languages
+    # Las que no responden dejan de recibir peticiones y las que se recuperan vuelven a recibirlas
+    def _health_check_loop(self, interval):
+        while not self.stopped.wait(interval):
+            for endpoint in self.endpoints:
+                health_url = endpoint.url.rsplit('/', 1)[0] + '/languages'
+                try:
+                    healthy = self.session.get(health_url, timeout=self.timeout[0]).status_code == 200
+                except requests.RequestException:
+                    healthy = False
+
+                if healthy and not endpoint.healthy:
+                    print(f"El servidor {endpoint.url} vuelve a responder")
+                    endpoint.breaker.record_success()
+                elif not healthy and endpoint.healthy:
+                    print(f"El servidor {endpoint.url} no responde, se deja de usar")
+                with self.condition:
+                    endpoint.healthy = healthy
+                    self.condition.notify_all()
+
+    # Función para traducir los segmentos que no están en la memoria de traducción, enviando 'q'
+    # como lista en pocas peticiones; los lotes se reparten entre los hilos del cliente. Si un lote
+    # falla tras agotar los reintentos se lanza TranslationError, en lugar de devolver el texto sin traducir
+    def translate_segments(self, segments, source, target, fmt):
+        batches = []
+        for batch in pack_batches(segments, self.char_limit, self.size_limit):
+            chunk = [segments[i] for i in batch]
+            batches.append((chunk, self.executor.submit(self.request, chunk, source, target, fmt)))
+        if self.metrics is not None:
+            self.metrics.count('batches', len(batches))
+
+        translations = {}
+        failure = None
+        for chunk, future in batches:
+            try:
+                received = future.result()
+                if not isinstance(received, list) or len(received) != len(chunk):
+                    raise TranslationError(f"El servidor no ha devuelto una traducción por cada uno de los "
+                                           f"{len(chunk)} textos del lote")
+                translations.update(zip(chunk, received))
+            except TranslationError as error:
+                failure = failure or error
+        if failure is not None:
+            # Guardar los lotes que han llegado aunque alguno haya fallado
+            self.remember(translations, source, target, fmt)
+            raise failure
+        return translations
+
+    def close(self):
+        self.stopped.set()
+        self.executor.shutdown()
+        self.session.close()
+        super().close()
@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Índice en memoria del árbol de contenido
+# Guarda los archivos .md de origen con su mtime, las traducciones existentes de cada uno por
+# idioma (archivo.<idioma>.md) y los subdirectorios de cada carpeta, para que el listado, las
+# estadísticas y el organigrama no tengan que volver a recorrer el disco
+class ContentIndex:
+    def __init__(self, root, languages):
+        self.root = Path(root)
+        self.languages = list(languages)
+        self.sources = {}  # {ruta de origen: mtime}
+        self.translations = {}  # {ruta de origen: {idioma: mtime}}
+        self.directories = {}  # {carpeta: [subcarpetas]}
+
+    # Función para saber si existe la traducción de un archivo de origen a un idioma
+    def has_translation(self, source_path, language):
+        return language in self.translations.get(source_path, {})
+
+    # Función para obtener las subcarpetas de una carpeta (ordenadas por nombre)
+    def subdirectories(self, directory):
+        return self.directories.get(Path(directory), [])
+
+    # Función para saber si un archivo .md de origen existe
+    def has_source(self, path):
+        return Path(path) in self.sources
+
+    # Función para añadir o actualizar un archivo .md tras un cambio en disco
+    def add_file(self, path, mtime):
+        language, source_path = self._split_language(path)
+        if language is None:
+            self.sources[path] = mtime
+        else:
+            self.translations.setdefault(source_path, {})[language] = mtime
+
+    # Función para quitar del índice un archivo .md borrado
+    def remove_file(self, path):
+        language, source_path = self._split_language(path)
+        if language is None:
+            self.sources.pop(path, None)
+        else:
+            self.translations.get(source_path, {}).pop(language, None)
+
+    # Función para separar el sufijo de idioma de un archivo (.en.md) de su archivo de origen
+    # Devuelve (None, ruta) si el archivo es de origen
+    def _split_language(self, path):
+        for language in self.languages:
+            if path.name.endswith(f'.{language}.md'):
+                return language, path.with_name(path.name[:-len(f'.{language}.md')] + '.md')
+        return None, path
+
+# Función para leer una carpeta con os.scandir
+# Devuelve sus subcarpetas ordenadas y sus archivos .md con su mtime
+def scan_directory(directory):
+    subdirectories = []
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):  # Un enlace a una carpeta superior no se recorre
+                subdirectories.append(Path(entry.path))
+            elif entry.is_file() and entry.name.endswith('.md'):
+                files.append((Path(entry.path), entry.stat().st_mtime))
+    subdirectories.sort()
+    return subdirectories, files
+
+# Función para recorrer el árbol de contenido una sola vez con os.scandir y construir el índice
+# Las carpetas de cada nivel del árbol se leen en paralelo con workers hilos. Con max_depth solo se
+# leen las carpetas hasta ese nivel por debajo de directory (las subcarpetas del último nivel se
+# anotan pero no se recorren)
+def scan_content(directory, languages, workers=8, max_depth=None):
+    root = Path(directory)
+    if not root.is_dir():
+        raise ValueError(f"La ruta proporcionada no es un directorio válido: {directory}")
+
+    content_index = ContentIndex(root, languages)
+    level = [root]
+    depth = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while level and (max_depth is None or depth <= max_depth):
+            next_level = []
+            for current, (subdirectories, files) in zip(level, executor.map(scan_directory, level)):
+                for path, mtime in files:
+                    content_index.add_file(path, mtime)
+                content_index.directories[current] = subdirectories
+                next_level.extend(subdirectories)
+            level = next_level
+            depth += 1
+
+    return content_index
@@ -0,0 +1,91 @@
+import random
+import threading
+import time
+
+# Función para calcular la espera antes de reintentar una petición (backoff exponencial con jitter completo)
+def backoff_delay(attempt, base_delay, max_delay):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+# Límite adaptativo de peticiones en curso (AIMD)
+# Cada respuesta correcta suma 1/limit al límite (una petición más por cada ronda completa) y cada
+# señal de sobrecarga (429, 5xx, timeout o latencia por encima de target_latency) lo multiplica por
+# decrease_factor, como mucho una vez por ronda para no hundirlo con las respuestas de una misma ráfaga.
+# Varios limitadores pueden compartir una misma condición para esperar a que cualquiera tenga hueco
+class AdaptiveLimiter:
+    def __init__(self, initial, minimum=1, maximum=None, target_latency=None, decrease_factor=0.5,
+                 condition=None):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = float(max(minimum, min(initial, self.maximum)))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = condition or threading.Condition()
+
+    # Función para ocupar un hueco si lo hay, sin esperar (con self.condition ya adquirida)
+    def try_acquire(self):
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    # Función para liberar el hueco de una petición y ajustar el límite según su resultado
+    def release(self, latency, overloaded=False):
+        with self.condition:
+            self.in_flight -= 1
+            if self.target_latency is not None and latency > self.target_latency:
+                overloaded = True
+
+            now = time.monotonic()
+            if overloaded:
+                if now - self.last_decrease > latency:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+# Cortocircuito para dejar de enviar peticiones a un servidor caído
+# Tras failure_threshold fallos seguidos se abre durante cooldown segundos; pasado ese tiempo deja
+# pasar una única petición de prueba y, si sale bien, se vuelve a cerrar. Solo deben contar como
+# fallos los que indican que el servidor no responde, no las respuestas de sobrecarga
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    # Función para saber, sin reservar la petición de prueba, si se podrá enviar una petición sin
+    # esperar a que pase el cooldown (con la petición de prueba en curso, en cuanto esta responda)
+    def available(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            return self.probing or time.monotonic() - self.opened_at >= self.cooldown
+
+    # Función para saber si se puede enviar una petición
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.probing = True  # Semiabierto: solo pasa la petición de prueba
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.probing = False
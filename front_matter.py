@@ -0,0 +1,94 @@
+import json
+import re
+import threading
+import yaml
+from pathlib import Path
+from writer import write_if_changed
+
+# Cargador de YAML en C (libyaml) si está disponible, el de Python si no
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Delimitador del front matter YAML (el mismo que reconoce python-frontmatter)
+BOUNDARY_RE = re.compile(r'^-{3,}\s*$')
+
+# Función para leer la cabecera YAML de un archivo abierto, deteniéndose en el '---' de cierre
+# Devuelve el diccionario de metadatos ({} si el archivo no tiene front matter) y si lo tenía
+def _read_header(file):
+    line = file.readline()
+    while line and not line.strip():  # python-frontmatter ignora las líneas vacías iniciales
+        line = file.readline()
+    if not BOUNDARY_RE.match(line):
+        return {}, False
+
+    header = []
+    for line in file:
+        if BOUNDARY_RE.match(line):
+            return load_header(header), True
+        header.append(line)
+    return {}, False  # Sin delimitador de cierre no hay front matter
+
+# Función para convertir las líneas de una cabecera YAML (sin los delimitadores) en un diccionario
+def load_header(lines):
+    metadata = yaml.load("".join(lines), Loader=YAML_LOADER)
+    return metadata if isinstance(metadata, dict) else {}
+
+# Función para leer solo el front matter de un archivo Markdown
+# A diferencia de frontmatter.load no lee ni procesa el contenido del post
+def read_front_matter(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        metadata, _ = _read_header(file)
+    return metadata
+
+# Función para separar la cabecera YAML del texto de un archivo Markdown, sin tocar nada más
+# Devuelve (texto hasta el '---' de apertura incluido, cabecera, texto desde el '---' de cierre)
+# o None si el archivo no tiene front matter
+def split_front_matter(text):
+    lines = text.splitlines(keepends=True)
+    start = 0
+    while start < len(lines) and not lines[start].strip():  # Como python-frontmatter
+        start += 1
+    if start == len(lines) or not BOUNDARY_RE.match(lines[start]):
+        return None
+    for end in range(start + 1, len(lines)):
+        if BOUNDARY_RE.match(lines[end]):
+            return "".join(lines[:start + 1]), "".join(lines[start + 1:end]), "".join(lines[end:])
+    return None
+
+# Caché en disco (JSON) de los datos extraídos del front matter de cada archivo
+# Cada entrada guarda el mtime del archivo y solo se vuelve a leer el archivo si su mtime cambia.
+# Al guardar se descartan las entradas de archivos que no se han consultado (archivos borrados)
+class MetadataCache:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.entries = {}  # {ruta: {'mtime', 'kind', 'data'}}
+        self.seen = set()
+        self.parsed = 0  # Archivos leídos en esta ejecución (el resto salió de la caché)
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file).get('files', {})
+
+    # Función para obtener los datos de un archivo: de la caché si su mtime no ha cambiado o
+    # llamando a extract(ruta) si sí. kind distingue datos extraídos de formas distintas
+    def get(self, file_path, mtime, extract, kind=None):
+        key = str(file_path)
+        kind = kind or extract.__name__
+        with self.lock:
+            self.seen.add(key)
+            entry = self.entries.get(key)
+        if entry is not None and entry['mtime'] == mtime and entry['kind'] == kind:
+            return entry['data']
+
+        # Pasar los datos por JSON para que devuelvan lo mismo que cuando salen de la caché (fechas como texto)
+        data = json.loads(json.dumps(extract(file_path), ensure_ascii=False, default=str))
+        with self.lock:
+            self.entries[key] = {'mtime': mtime, 'kind': kind, 'data': data}
+            self.parsed += 1
+        return data
+
+    # Función para guardar la caché en disco (de forma atómica y solo si cambia, ver writer.py)
+    def save(self):
+        with self.lock:
+            entries = {key: entry for key, entry in self.entries.items() if key in self.seen}
+            write_if_changed(self.path, json.dumps({'files': entries}, ensure_ascii=False))
@@ -0,0 +1,33 @@
+import base64
+import hashlib
+import os
+
+# Hashes SHA-256 con los que el manifiesto, la memoria de traducción y writer.py identifican
+# el contenido de los textos y los archivos
+
+# Función para calcular el hash del contenido de un texto
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# Función para calcular el hash corto de un bloque: los 16 primeros bytes del SHA-256 en base64
+# (22 caracteres en lugar de los 64 del hash en hexadecimal)
+def block_hash(text):
+    return compact_digest(hashlib.sha256(text.encode('utf-8')).digest())
+
+def compact_digest(digest):
+    return base64.b64encode(digest[:16]).decode('ascii').rstrip('=')
+
+# Función para calcular el hash del contenido de un archivo sin cargarlo entero en memoria
+def file_hash(path):
+    return file_hash_and_mtime(path)[0]
+
+# Función para calcular el hash de un archivo y obtener el mtime que corresponde a ese contenido
+# El mtime se toma con os.fstat del mismo archivo abierto antes de leerlo: si el archivo se guarda
+# mientras tanto, el mtime registrado será anterior al nuevo y el cambio se detectará
+def file_hash_and_mtime(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        mtime = os.fstat(file.fileno()).st_mtime
+        for block in iter(lambda: file.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest(), mtime
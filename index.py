@@ -1,46 +1,215 @@
-import frontmatter
+import copy
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from front_matter import YAML_LOADER, load_header, split_front_matter
+from hashes import file_hash_and_mtime, text_hash
+from metrics import stage
+from segmenter import render_scalar
+from writer import write_if_changed
+
+# Campos del front matter de los _index.md que se traducen por defecto
+# Cada campo es una ruta separada por puntos: '*' vale para cualquier clave y 'clave[]' recorre
+# los elementos de una lista (por ejemplo 'tags[]' o 'menu.*.name')
+INDEX_FIELDS = ('title', 'description', 'summary', 'menu.*.name')
 
 # Función para verificar si el archivo es un _index.md
 def is_index_file(file_name):
     return file_name.startswith("_index.md")
 
-# Función para procesar archivos _index.md
-def process_index_file(file_path, input_language, output_language, translate_text):
-    # Cargar el contenido del archivo Markdown
-    text = frontmatter.load(file_path)
-    
-    # Extraer el contenido YAML
-    yaml_content = text.metadata
-
-    # Traducir el título si existe
-    if 'title' in yaml_content:
-        yaml_content['title'] = translate_text(yaml_content['title'], input_language, output_language)
-
-    # Verificar la existencia de 'menu' y 'sidebar' antes de acceder a ellos
-    if isinstance(yaml_content.get('menu'), dict):
-        menu_content = yaml_content['menu']
-        
-        if isinstance(menu_content.get('sidebar'), dict):
-            sidebar = menu_content['sidebar']
-            
-            # Traducir el campo 'name' si existe
-            if 'name' in sidebar:
-                sidebar['name'] = translate_text(sidebar['name'], input_language, output_language)
-
-    # Asegurar que se mantenga la estructura original del YAML
-    translated_yaml_content = {
-        'title': yaml_content.get('title', '')  # Mantiene 'title', aunque no exista en algunos casos
-    }
-    
-    if 'menu' in yaml_content:  # Solo agrega 'menu' si existe en el original
-        translated_yaml_content['menu'] = yaml_content['menu']
-
-    # Asignamos el contenido traducido de vuelta al texto
-    text.metadata = translated_yaml_content
-
-    # Escribir el archivo traducido
-    write_file_path = file_path.with_name(file_path.stem + f'.{output_language}.md')
-    with open(write_file_path, 'w', encoding='utf-8') as f:
-        f.write(frontmatter.dumps(text))
-    
-    print(f"Archivo _index.md traducido guardado en: {write_file_path}")
\ No newline at end of file
+# Función para buscar en los metadatos los textos que corresponden a una ruta de campo
+# Devuelve pares (contenedor, clave) para poder leer y sustituir cada valor
+def find_fields(metadata, field):
+    found = []
+
+    def walk(node, parts):
+        key, rest = parts[0], parts[1:]
+        is_list = key.endswith('[]')
+        if is_list:
+            key = key[:-2]
+        if not isinstance(node, dict):
+            return
+
+        for name in (list(node) if key == '*' else [key] if key in node else []):
+            if is_list:
+                if not isinstance(node[name], list):
+                    continue
+                targets = [(node[name], i) for i in range(len(node[name]))]
+            else:
+                targets = [(node, name)]
+
+            for container, idx in targets:
+                if rest:
+                    walk(container[idx], rest)
+                elif isinstance(container[idx], str) and container[idx].strip():
+                    found.append((container, idx))
+
+    walk(metadata, field.split('.'))
+    return found
+
+# Función para buscar en el árbol de nodos de una cabecera YAML (yaml.compose) los valores de una
+# ruta de campo, igual que find_fields; devuelve los nodos de texto, que guardan su posición en la cabecera
+def find_field_nodes(root, field):
+    found = []
+
+    def walk(node, parts):
+        key, rest = parts[0], parts[1:]
+        is_list = key.endswith('[]')
+        if is_list:
+            key = key[:-2]
+        if not isinstance(node, yaml.MappingNode):
+            return
+
+        for key_node, value_node in node.value:
+            if key != '*' and key_node.value != key:
+                continue
+            if is_list:
+                if not isinstance(value_node, yaml.SequenceNode):
+                    continue
+                targets = value_node.value
+            else:
+                targets = [value_node]
+
+            for target in targets:
+                if rest:
+                    walk(target, rest)
+                elif isinstance(target, yaml.ScalarNode) and target.tag == 'tag:yaml.org,2002:str' \
+                        and target.value.strip():
+                    found.append(target)
+
+    walk(root, field.split('.'))
+    return found
+
+# Función para escribir la cabecera YAML de un _index.md con los valores de fields traducidos
+# Cada valor se sustituye en su sitio con las comillas del original (ver segmenter.render_scalar),
+# así el orden de las claves, los comentarios y el formato del resto de la cabecera no cambian.
+# expected son los metadatos traducidos; si la cabecera resultante no se lee igual (por ejemplo,
+# un valor de varias líneas o dentro de una lista [a, b]), se prueba con todos los valores entre
+# comillas dobles y, si tampoco, se vuelve a escribir la cabecera entera con YAML
+def translate_header(header, fields, translations, expected):
+    root = yaml.compose(header, Loader=YAML_LOADER)
+    nodes = {}
+    for field in fields:
+        for node in find_field_nodes(root, field):
+            nodes[node.start_mark.index] = node
+
+    for force_quotes in (False, True):
+        parts = []
+        position = 0
+        for start, node in sorted(nodes.items()):
+            if node.value not in translations:
+                continue
+            if node.style not in (None, '', "'", '"') or node.start_mark.line != node.end_mark.line:
+                break  # Escalares de bloque o de varias líneas: no se pueden sustituir en una línea
+            quote = '"' if force_quotes else node.style or ''
+            parts += [header[position:start], render_scalar(translations[node.value], quote)]
+            position = node.end_mark.index
+        else:
+            translated = "".join(parts) + header[position:]
+            try:
+                if load_header([translated]) == expected:
+                    return translated
+            except yaml.YAMLError:
+                pass
+    line_break = '\r\n' if '\r\n' in header else None
+    return yaml.safe_dump(expected, allow_unicode=True, sort_keys=False, line_break=line_break)
+
+# Función para obtener los textos a traducir de unos metadatos, sin repetir
+def field_texts(metadata, fields=INDEX_FIELDS):
+    texts = []
+    for field in fields:
+        texts += [container[key] for container, key in find_fields(metadata, field)]
+    return list(dict.fromkeys(texts))
+
+# Función para procesar varios archivos _index.md a la vez
+# files es una lista de (ruta, idiomas). Primero se leen todos los archivos y, para cada idioma,
+# se reúnen los textos de los campos de fields de todos ellos sin repetir y se traducen con una sola
+# llamada a translate_batch (que los agrupa en pocas peticiones); después se escribe cada archivo.
+# El resto del front matter y el contenido se copian byte a byte (ver translate_header). Los idiomas
+# se traducen en paralelo.
+# Si se pasan métricas (metrics.Metrics) se anota la duración de cada etapa.
+# Devuelve {ruta: error} con los archivos que no se han podido traducir
+def process_index_files(files, input_language, translate_batch, manifest=None, metrics=None, fields=INDEX_FIELDS):
+    errors = {}
+
+    # Cargar el front matter y el contenido de cada archivo una sola vez
+    loaded = {}
+    for file_path, _ in files:
+        try:
+            with stage(metrics, 'front_matter', file=file_path.name):
+                # El hash y el mtime se toman antes de leer: si el archivo cambia entre medias, el
+                # manifiesto registra el contenido anterior y el cambio se traduce en la siguiente ejecución
+                source_hash, source_mtime = file_hash_and_mtime(file_path)
+                with open(file_path, 'r', encoding='utf-8', newline='') as file:
+                    text = file.read()
+                parts = split_front_matter(text)
+                if parts is None:  # Sin front matter no hay nada que traducir y se copia tal cual
+                    parts = ('', '', text)
+                metadata = load_header([parts[1]])
+                loaded[file_path] = (metadata, parts, source_hash, source_mtime)
+        except Exception as error:
+            errors[file_path] = error
+
+    output_languages = list(dict.fromkeys(lang for _, file_languages in files for lang in file_languages))
+
+    # Función para traducir todos los archivos a un idioma y escribirlos
+    def translate_into(output_language):
+        targets = [file_path for file_path, file_languages in files
+                   if output_language in file_languages and file_path in loaded]
+        texts = list(dict.fromkeys(text for file_path in targets for text in field_texts(loaded[file_path][0], fields)))
+        try:
+            translations = dict(zip(texts, translate_batch(texts, input_language, output_language))) if texts else {}
+        except Exception as error:
+            for file_path in targets:
+                errors.setdefault(file_path, error)
+            return
+
+        for file_path in targets:
+            try:
+                metadata, parts, source_hash, source_mtime = loaded[file_path]
+
+                # Sustituir los campos traducidos en una copia para no mezclar las traducciones de cada idioma
+                translated_metadata = copy.deepcopy(metadata)
+                for field in fields:
+                    for container, key in find_fields(translated_metadata, field):
+                        container[key] = translations.get(container[key], container[key])
+
+                # Escribir el archivo traducido (de forma atómica y solo si cambia, ver writer.py)
+                write_file_path = file_path.with_name(file_path.stem + f'.{output_language}.md')
+                with stage(metrics, 'write', file=file_path.name, target=output_language):
+                    opening, header, rest = parts
+                    translated_content = opening + translate_header(header, fields, translations,
+                                                                    translated_metadata) + rest
+                    changed = write_if_changed(write_file_path, translated_content)
+
+                    # Registrar la traducción para no repetirla mientras el archivo de origen no cambie
+                    if manifest is not None:
+                        manifest.record(file_path, output_language, source_hash, source_mtime,
+                                        text_hash(translated_content), [])
+
+                if changed:
+                    print(f"Archivo _index.md traducido guardado en: {write_file_path}")
+                else:
+                    print(f"Archivo _index.md traducido sin cambios: {write_file_path}")
+            except Exception as error:
+                errors.setdefault(file_path, error)
+
+    if len(output_languages) == 1:
+        translate_into(output_languages[0])
+    elif output_languages:
+        with ThreadPoolExecutor(max_workers=len(output_languages)) as executor:
+            for future in [executor.submit(translate_into, lang) for lang in output_languages]:
+                future.result()
+
+    return errors
+
+# Función para procesar un archivo _index.md
+# output_languages puede ser un idioma o una lista de idiomas (ver process_index_files)
+def process_index_file(file_path, input_language, output_languages, translate_batch, manifest=None, metrics=None,
+                       fields=INDEX_FIELDS):
+    if isinstance(output_languages, str):
+        output_languages = [output_languages]
+
+    errors = process_index_files([(file_path, output_languages)], input_language, translate_batch, manifest,
+                                 metrics, fields)
+    if file_path in errors:
+        raise errors[file_path]
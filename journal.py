@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+# Diario (JSONL) de los bloques ya traducidos durante la ejecución
+# Cada línea guarda la traducción de un bloque de un archivo a un idioma y se escribe en disco en
+# cuanto llega del servidor. Si la ejecución se interrumpe, la siguiente recupera del diario lo que
+# ya estaba traducido y continúa desde ahí. Al terminar un archivo se añade una marca 'done' y sus
+# entradas dejan de ser necesarias. En memoria solo se guardan las traducciones recuperadas de la
+# ejecución anterior; las de la ejecución en curso solo están en el archivo
+class TranslationJournal:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.recovered = {}  # {(archivo, idioma): {hash del bloque: texto traducido}} de la ejecución anterior
+        self.active = set()  # (archivo, idioma) con entradas en el diario y sin marca 'done'
+
+        for entry in self._entries():
+            key = (entry['file'], entry['target'])
+            if entry.get('done'):
+                self.recovered.pop(key, None)
+            else:
+                self.recovered.setdefault(key, {})[entry['hash']] = entry['text']
+        self.active.update(self.recovered)
+
+        # Reescribir el diario sin las líneas incompletas ni los archivos ya terminados
+        self.file = None
+        self.compact()
+
+    # Función que recorre las entradas del diario en disco, sin las líneas a medio escribir
+    def _entries(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # Línea a medio escribir cuando se interrumpió la ejecución
+
+    # Función para obtener los bloques de un archivo que ya se tradujeron en una ejecución anterior
+    def get(self, file_path, target):
+        with self.lock:
+            return dict(self.recovered.get((str(file_path), target), {}))
+
+    # Función para añadir al diario varias traducciones {hash del bloque: texto traducido}
+    def append(self, file_path, target, translations):
+        if not translations:
+            return
+
+        key = (str(file_path), target)
+        with self.lock:
+            for hash_, text in translations.items():
+                self.file.write(json.dumps({'file': key[0], 'target': target, 'hash': hash_, 'text': text},
+                                           ensure_ascii=False) + '\n')
+            self._sync()
+            self.active.add(key)
+
+    # Función para marcar un archivo como terminado (ya escrito en disco)
+    def complete(self, file_path, target):
+        key = (str(file_path), target)
+        with self.lock:
+            self.recovered.pop(key, None)
+            if key not in self.active:
+                return
+            self.active.discard(key)
+            self.file.write(json.dumps({'file': key[0], 'target': target, 'done': True}) + '\n')
+            self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    # Función para reescribir el diario solo con las entradas de los archivos sin terminar
+    # Se recorre el archivo dos veces sin cargarlo: la primera busca la última marca 'done' de cada
+    # archivo y la segunda copia las entradas posteriores a ella
+    def compact(self):
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+
+            last_done = {}  # {(archivo, idioma): número de la última entrada 'done'}
+            for number, entry in enumerate(self._entries()):
+                if entry.get('done'):
+                    last_done[(entry['file'], entry['target'])] = number
+
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                for number, entry in enumerate(self._entries()):
+                    if not entry.get('done') and number > last_done.get((entry['file'], entry['target']), -1):
+                        file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(temp_path, self.path)
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,181 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+from pathlib import Path
+from hashes import compact_digest, file_hash, file_hash_and_mtime
+from writer import replace_if_changed, write_if_changed
+
+# Segmentos a partir de los cuales la lista de segmentos de un archivo traducido no se guarda en el
+# manifiesto sino en su propio archivo (en la carpeta <manifiesto>.segments), que solo se lee al
+# volver a traducirlo; así el manifiesto que se carga en memoria no crece con el tamaño de los archivos
+SPILL_SEGMENTS = 200
+
+# Función para convertir la lista de segmentos [hash del bloque o None, longitud] en texto, una
+# línea por segmento ('-' en lugar del hash si el bloque no está traducido)
+def encode_segments(segments):
+    for hash_, length in segments:
+        yield f"{hash_ or '-'} {length}\n"
+
+# Función para leer las líneas de encode_segments y generar de nuevo los pares [hash o None, longitud]
+def decode_segments(lines):
+    for line in lines:
+        hash_, length = line.split()
+        yield (None if hash_ == '-' else hash_), int(length)
+
+# Manifiesto de traducciones en formato JSON
+# Para cada archivo de origen y cada idioma de salida guarda el hash del origen que se tradujo,
+# el hash del archivo traducido y la lista de segmentos [hash del segmento de origen, longitud
+# de su traducción en el archivo de salida] (ver encode_segments; las de más de SPILL_SEGMENTS
+# segmentos, en un archivo aparte). Con esas longitudes se pueden recuperar del archivo traducido
+# existente los segmentos que no han cambiado
+class Manifest:
+    def __init__(self, path, root):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.segments_directory = self.path.with_name(self.path.name + '.segments')
+        self.lock = threading.Lock()
+        self.files = {}
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.files = json.load(file).get('files', {})
+
+    def _key(self, source_path):
+        return Path(source_path).relative_to(self.root).as_posix()
+
+    # Función para obtener la entrada de un archivo traducido a un idioma (o None)
+    def get_output(self, source_path, output_language):
+        with self.lock:
+            return self.files.get(self._key(source_path), {}).get(output_language)
+
+    # Función para decidir si una traducción existente ha quedado desactualizada
+    # Devuelve True si el origen ha cambiado desde la última traducción. Si se conoce el mtime
+    # del origen y coincide con el registrado no hace falta leer el archivo; si no coincide pero el
+    # contenido es el mismo (git clone, touch) se registra el mtime nuevo. Los archivos traducidos a
+    # mano después de la última traducción se respetan. Una traducción sin entrada en el manifiesto
+    # (anterior a él) está desactualizada si el origen se ha modificado después que ella; si no, se
+    # da por buena y se registra tal como está, sin segmentos: así los cambios posteriores del origen
+    # se detectan y el archivo se vuelve a traducir entero una vez. Los mtime que no se pasan
+    # (por ejemplo, los del índice de contenido) se leen del disco
+    def is_outdated(self, source_path, output_path, output_language, source_mtime=None, output_mtime=None):
+        output = self.get_output(source_path, output_language)
+        if output is None:
+            if not Path(output_path).exists():
+                return False
+            source_hash, mtime = file_hash_and_mtime(source_path)
+            if output_mtime is None:
+                output_mtime = os.stat(output_path).st_mtime
+            if mtime > output_mtime:
+                return True
+            self.record(source_path, output_language, source_hash, mtime, file_hash(output_path), [])
+            return False
+        if source_mtime is not None and output.get('source_mtime') == source_mtime:
+            return False
+        source_hash, mtime = file_hash_and_mtime(source_path)
+        if source_hash == output['source_hash']:
+            with self.lock:
+                output['source_mtime'] = mtime
+            return False
+        if file_hash(output_path) != output['hash']:
+            print(f"El archivo {output_path} se ha modificado a mano, no se vuelve a traducir")
+            return False
+        return True
+
+    # Función para recuperar del archivo traducido existente los segmentos que no han cambiado
+    # Devuelve un PreviousSegments que se consulta como un diccionario {hash del segmento de origen:
+    # texto traducido}; el archivo se recorre una vez sin cargarlo entero y cada texto se lee al pedirlo
+    def previous_segments(self, source_path, output_path, output_language):
+        output = self.get_output(source_path, output_language)
+        if output is None or not output_path.exists():
+            return PreviousSegments()
+
+        digest = hashlib.sha256()
+        offsets = {}
+        offset = 0
+        with open(output_path, 'r', encoding='utf-8', newline='') as file:
+            for hash_, length in self._segments(source_path, output_language, output):
+                data = file.read(length).encode('utf-8')
+                digest.update(data)
+                if hash_ is not None:
+                    offsets[hash_] = (offset, len(data))
+                offset += len(data)
+            for block in iter(lambda: file.read(1 << 16), ''):
+                digest.update(block.encode('utf-8'))
+        if digest.hexdigest() != output['hash']:
+            return PreviousSegments()
+        return PreviousSegments(output_path, offsets)
+
+    # Función para generar los segmentos [hash o None, longitud] registrados de una traducción
+    def _segments(self, source_path, output_language, output):
+        segments = output['segments']
+        if segments is None:  # Guardados aparte por ser muchos
+            with open(self._segments_path(source_path, output_language), 'r', encoding='utf-8') as file:
+                yield from decode_segments(file)
+        elif isinstance(segments, list):
+            # Manifiesto anterior a los hashes cortos: [[hash en hexadecimal o None, longitud], ...]
+            for hash_, length in segments:
+                yield (compact_digest(bytes.fromhex(hash_)) if hash_ else None), length
+        else:
+            yield from decode_segments(segments.splitlines())
+
+    # Función para obtener el archivo en el que se guardan aparte los segmentos de una traducción
+    def _segments_path(self, source_path, output_language):
+        name = hashlib.sha256(f'{self._key(source_path)}\0{output_language}'.encode('utf-8')).hexdigest()[:32]
+        return self.segments_directory / f'{name}.txt'
+
+    # Función para registrar la traducción de un archivo
+    # source_hash y source_mtime son los del contenido de origen que se ha traducido (file_hash_and_mtime)
+    # y segments genera los pares [hash del segmento de origen o None, longitud de su texto de salida]
+    # en orden. Si son más de SPILL_SEGMENTS se escriben en su propio archivo sin cargarlos en memoria
+    def record(self, source_path, output_language, source_hash, source_mtime, output_hash, segments):
+        segments = iter(segments)
+        first = list(itertools.islice(segments, SPILL_SEGMENTS + 1))
+        segments_path = self._segments_path(source_path, output_language)
+        if len(first) <= SPILL_SEGMENTS:
+            encoded = ''.join(encode_segments(first))
+            if segments_path.exists():
+                os.remove(segments_path)
+        else:
+            encoded = None
+            self.segments_directory.mkdir(exist_ok=True)
+            temp_path = segments_path.with_name(segments_path.name + '.tmp')
+            digest = hashlib.sha256()
+            with open(temp_path, 'w', encoding='utf-8', newline='') as file:
+                for line in encode_segments(itertools.chain(first, segments)):
+                    file.write(line)
+                    digest.update(line.encode('utf-8'))
+            replace_if_changed(temp_path, segments_path, digest.hexdigest())
+
+        with self.lock:
+            self.files.setdefault(self._key(source_path), {})[output_language] = {
+                'source_hash': source_hash,
+                'source_mtime': source_mtime,
+                'hash': output_hash,
+                'segments': encoded
+            }
+
+    # Función para guardar el manifiesto en disco (de forma atómica y solo si cambia, ver writer.py)
+    def save(self):
+        with self.lock:
+            write_if_changed(self.path, json.dumps({'files': self.files}, ensure_ascii=False))
+
+# Segmentos de un archivo traducido existente, guardados como posición y tamaño en bytes
+# El texto de cada segmento se lee del archivo cuando se pide, así la memoria no crece con su tamaño
+class PreviousSegments:
+    def __init__(self, path=None, offsets=None):
+        self.offsets = offsets or {}
+        self.file = open(path, 'rb') if self.offsets else None
+
+    def __contains__(self, hash_):
+        return hash_ in self.offsets
+
+    def __getitem__(self, hash_):
+        start, size = self.offsets[hash_]
+        self.file.seek(start)
+        return self.file.read(size).decode('utf-8')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
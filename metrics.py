@@ -0,0 +1,95 @@
+import bisect
+import contextlib
+import json
+import threading
+import time
+
+# Límites (en segundos) de los intervalos del histograma de duraciones: de 0,1 ms a unos 8 minutos,
+# cada uno un 25 % mayor que el anterior
+BUCKETS = tuple(0.0001 * 1.25 ** i for i in range(70))
+
+# Histograma de duraciones con intervalos fijos: ocupa lo mismo sea cual sea el número de medidas
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    # Función para estimar un percentil (0-100) con el límite superior de su intervalo
+    def percentile(self, percent):
+        rank = percent / 100 * self.count
+        cumulative = 0
+        for idx, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                return min(BUCKETS[idx], self.max) if idx < len(BUCKETS) else self.max
+        return self.max
+
+# Métricas de una ejecución: duración de cada etapa (lectura, segmentación, peticiones, escritura...)
+# y contadores (caracteres enviados, aciertos de la memoria...). Si se indica trace_path, cada medida
+# se escribe también como una línea JSON para poder analizar la ejecución después
+class Metrics:
+    def __init__(self, trace_path=None):
+        self.lock = threading.Lock()
+        self.stages = {}  # {etapa: Histogram}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.trace = open(trace_path, 'w', encoding='utf-8') if trace_path else None
+
+    # Función para medir una etapa: with metrics.stage('write', file=...) as fields
+    # Se pueden añadir datos a fields dentro del bloque; si hay una excepción se anota en 'error'
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            yield fields
+        except Exception as error:
+            fields['error'] = type(error).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, **fields)
+
+    # Función para anotar la duración de una etapa ya medida
+    def record(self, name, duration, **fields):
+        with self.lock:
+            self.stages.setdefault(name, Histogram()).add(duration)
+            if self.trace is not None:
+                event = {'time': round(time.time(), 6), 'stage': name, 'duration': round(duration, 6), **fields}
+                self.trace.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+
+    # Función para sumar a un contador
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Función para mostrar la tabla resumen de la ejecución
+    def print_summary(self):
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            print(f"Resumen de la ejecución ({elapsed:.2f}s):")
+            print(f"  {'Etapa':<16}{'Veces':>8}{'Total s':>10}{'Media ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'Máx ms':>10}")
+            for name, histogram in self.stages.items():
+                print(f"  {name:<16}{histogram.count:>8}{histogram.total:>10.2f}"
+                      f"{histogram.total / histogram.count * 1000:>10.1f}{histogram.percentile(50) * 1000:>10.1f}"
+                      f"{histogram.percentile(99) * 1000:>10.1f}{histogram.max * 1000:>10.1f}")
+            for name, value in self.counters.items():
+                print(f"  {name}: {value}")
+
+    def close(self):
+        with self.lock:
+            if self.trace is not None:
+                self.trace.close()
+                self.trace = None
+
+# Función para medir una etapa si se usan métricas (metrics no es None) o no hacer nada si no
+def stage(metrics, name, **fields):
+    if metrics is None:
+        return contextlib.nullcontext(fields)
+    return metrics.stage(name, **fields)
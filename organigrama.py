@@ -1,11 +1,12 @@
-import frontmatter
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from content_index import scan_content
+from front_matter import MetadataCache, read_front_matter
 
 # Función para procesar el archivo _index.md de cada carpeta
 def process_index_file(file_path):
-    text = frontmatter.load(file_path)
-    yaml_content = text.metadata
+    yaml_content = read_front_matter(file_path)
     
     # Recogemos el 'menu' si está presente
     if 'menu' in yaml_content and 'sidebar' in yaml_content['menu']:
@@ -14,8 +15,7 @@ def process_index_file(file_path):
 
 # Función para procesar los archivos .md de cada post
 def process_post_file(file_path):
-    text = frontmatter.load(file_path)
-    yaml_content = text.metadata
+    yaml_content = read_front_matter(file_path)
     
     if 'title' in yaml_content and 'identifier' in yaml_content:
         return {
@@ -25,34 +25,54 @@ def process_post_file(file_path):
     return None
 
 # Función para construir el organigrama jerárquico basado en los archivos en el directorio
-def build_org_chart(directory):
+# Si no se pasa un índice de contenido (content_index.ContentIndex) se leen solo las categorías y
+# sus posts, los dos niveles que usa el organigrama.
+# Si se pasa una caché de metadatos (front_matter.MetadataCache) solo se leen los archivos que han
+# cambiado desde la última vez; los demás front matter se leen en paralelo con workers hilos
+def build_org_chart(directory, content_index=None, metadata_cache=None, workers=8):
+    if content_index is None:
+        content_index = scan_content(directory, [], workers, max_depth=2)
     org_chart = {}
-    
+
+    # Archivos cuyo front matter hace falta: el _index.md de cada categoría y el de cada post
+    jobs = []
+    for main_dir in content_index.subdirectories(directory):
+        jobs.append((main_dir / "_index.md", process_index_file))
+        for sub_dir in content_index.subdirectories(main_dir):
+            jobs.append((sub_dir / "_index.md", process_post_file))
+    jobs = [(path, extract) for path, extract in jobs if content_index.has_source(path)]
+
+    # Función para obtener los datos de un archivo, de la caché si no ha cambiado
+    def load(job):
+        path, extract = job
+        if metadata_cache is None:
+            return extract(path)
+        return metadata_cache.get(path, content_index.sources[path], extract)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        metadata = dict(zip((path for path, _ in jobs), executor.map(load, jobs)))
+
     # Procesamos las carpetas principales en content/posts/
-    for main_dir in Path(directory).iterdir():
-        if main_dir.is_dir():
-            category_name = main_dir.name
-            category_data = {
-                'title': category_name.replace('_', ' ').title(),  # Formato de nombre
-                'identifier': category_name,
-                'children': []
-            }
+    for main_dir in content_index.subdirectories(directory):
+        category_name = main_dir.name
+        category_data = {
+            'title': category_name.replace('_', ' ').title(),  # Formato de nombre
+            'identifier': category_name,
+            'children': []
+        }
 
-            # Buscar el archivo _index.md en la categoría
-            index_file = main_dir / "_index.md"
-            if index_file.exists():
-                index_data = process_index_file(index_file)
-                if index_data:
-                    category_data['title'] = index_data.get('name', category_data['title'])
+        # Buscar el archivo _index.md en la categoría
+        index_data = metadata.get(main_dir / "_index.md")
+        if index_data:
+            category_data['title'] = index_data.get('name', category_data['title'])
 
-            # Procesar los subdirectorios (posts) dentro de esta categoría
-            for sub_dir in main_dir.iterdir():
-                if sub_dir.is_dir():
-                    post_data = process_post_file(sub_dir / "_index.md")
-                    if post_data:
-                        category_data['children'].append(post_data)
-            
-            org_chart[category_name] = category_data
+        # Procesar los subdirectorios (posts) dentro de esta categoría
+        for sub_dir in content_index.subdirectories(main_dir):
+            post_data = metadata.get(sub_dir / "_index.md")
+            if post_data:
+                category_data['children'].append(post_data)
+        
+        org_chart[category_name] = category_data
     
     return org_chart
 
@@ -61,14 +81,19 @@ def save_org_chart(org_chart, output_file):
     with open(output_file, 'w') as yaml_file:
         yaml.dump(org_chart, yaml_file, default_flow_style=False, allow_unicode=True)
 
-# Directorios y archivo de salida
-input_directory = "/home/javiercruces/Documentos/sentinel/content/posts"  # Cambia esta ruta a la ruta correcta
-output_file = "organigrama.yaml"
+if __name__ == "__main__":
+    # Directorios y archivo de salida
+    input_directory = "/home/javiercruces/Documentos/sentinel/content/posts"  # Cambia esta ruta a la ruta correcta
+    output_file = "organigrama.yaml"
+    cache_file = "organigrama_cache.json"  # Front matter ya leído de cada archivo, por mtime
 
-# Generar el organigrama
-org_chart = build_org_chart(input_directory)
+    # Generar el organigrama leyendo solo los archivos que han cambiado desde la última vez
+    metadata_cache = MetadataCache(cache_file)
+    org_chart = build_org_chart(Path(input_directory), metadata_cache=metadata_cache)
+    metadata_cache.save()
 
-# Guardar el resultado en un archivo YAML
-save_org_chart(org_chart, output_file)
+    # Guardar el resultado en un archivo YAML
+    save_org_chart(org_chart, output_file)
 
-print(f"El organigrama ha sido guardado en {output_file}.")
\ No newline at end of file
+    print(f"El organigrama ha sido guardado en {output_file} "
+          f"({metadata_cache.parsed} archivos leídos, el resto desde {cache_file}).")
@@ -0,0 +1,116 @@
+import json
+from cache import split_segment
+from client import pack_batches
+from front_matter import read_front_matter
+from index import INDEX_FIELDS, field_texts
+from post import FRONT_MATTER_FIELDS, read_windows
+from segmenter import segment_markdown
+
+# Planificador de una ejecución: calcula, sin llamar al servidor, qué se enviaría a traducir
+# (segmentos, caracteres, aciertos de la memoria y peticiones HTTP) y estima cuánto tardaría a
+# partir de las peticiones anotadas en la traza de la última ejecución (metrics.Metrics)
+
+# Función para obtener las llamadas a translate_batch que haría post.py para traducir un post a
+# un idioma: una lista de textos por ventana, sin los bloques que se reutilizan del manifiesto o del diario
+def post_calls(file_path, output_language, manifest=None, journal=None, front_matter_fields=FRONT_MATTER_FIELDS):
+    previous_segments = None
+    if manifest is not None:
+        previous_segments = manifest.previous_segments(file_path, file_path.with_suffix(f'.{output_language}.md'),
+                                                       output_language)
+    journaled = journal.get(file_path, output_language) if journal is not None else {}
+
+    calls = []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for window in read_windows(segment_markdown(file, front_matter_fields)):
+                texts = [masked for _, _, block_hash, masked, _ in window
+                         if block_hash is not None and block_hash not in journaled
+                         and (previous_segments is None or block_hash not in previous_segments)]
+                if texts:
+                    calls.append(texts)
+    finally:
+        if previous_segments is not None:
+            previous_segments.close()
+    return calls
+
+# Función para obtener los textos que index.py traduciría de un _index.md
+# index.process_index_files traduce los de todos los _index.md de un idioma en una sola llamada
+def index_texts(file_path, fields=INDEX_FIELDS):
+    return field_texts(read_front_matter(file_path), fields)
+
+# Planificación de las llamadas de un idioma
+# Reproduce lo que hace backends.TranslationBackend.translate_batch con cada llamada: separa los
+# espacios de los extremos, quita los segmentos repetidos, consulta la memoria de traducción
+# (incluidos los segmentos que se habrán traducido antes en la misma ejecución) y agrupa el resto
+# en lotes con los límites del servidor (client.TranslationClient)
+class LanguagePlan:
+    def __init__(self, input_language, output_language, cache=None, char_limit=10000, size_limit=None,
+                 fmt="html"):
+        self.input_language = input_language
+        self.output_language = output_language
+        self.cache = cache
+        self.char_limit = char_limit
+        self.size_limit = size_limit
+        self.fmt = fmt
+        self.translated = set()  # Segmentos que se habrán guardado en la memoria durante la ejecución
+
+    # Función para planificar las llamadas de un archivo
+    # Devuelve {'segments', 'characters', 'cache_hits', 'batches', 'batch_characters': [...]}
+    def add(self, calls):
+        result = {'segments': 0, 'characters': 0, 'cache_hits': 0, 'batches': 0, 'batch_characters': []}
+        for texts in calls:
+            unique = list(dict.fromkeys(core for _, core, _ in map(split_segment, texts) if core))
+            known = {core for core in unique if core in self.translated}
+            if self.cache is not None:
+                known |= self.cache.contains_many([core for core in unique if core not in known],
+                                                  self.input_language, self.output_language, self.fmt)
+            missing = [core for core in unique if core not in known]
+
+            result['segments'] += len(texts)
+            result['characters'] += sum(len(text) for text in texts)
+            result['cache_hits'] += len(known)
+            for batch in pack_batches(missing, self.char_limit, self.size_limit):
+                result['batches'] += 1
+                result['batch_characters'].append(sum(len(missing[i]) for i in batch))
+            if self.cache is not None:
+                self.translated.update(missing)
+        return result
+
+# Función para calcular el rendimiento del servidor a partir de las peticiones de una traza JSONL
+# Ajusta por mínimos cuadrados la latencia de cada petición como fija + por carácter, y mide cuántas
+# peticiones había en curso de media. Devuelve None si la traza no tiene suficientes peticiones
+def load_throughput(trace_path):
+    requests = []
+    try:
+        with open(trace_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get('stage') == 'request' and event.get('status') == 'ok':
+                    requests.append((event['time'], event['duration'], event['characters']))
+    except FileNotFoundError:
+        return None
+    if len(requests) < 2:
+        return None
+
+    count = len(requests)
+    mean_chars = sum(chars for _, _, chars in requests) / count
+    mean_duration = sum(duration for _, duration, _ in requests) / count
+    variance = sum((chars - mean_chars) ** 2 for _, _, chars in requests)
+    per_char = 0.0
+    if variance:
+        per_char = max(0.0, sum((chars - mean_chars) * (duration - mean_duration)
+                                for _, duration, chars in requests) / variance)
+    overhead = max(0.0, mean_duration - per_char * mean_chars)
+
+    # Peticiones en curso de media: tiempo total de peticiones entre el tiempo en que hubo alguna
+    span = max(end for end, _, _ in requests) - min(end - duration for end, duration, _ in requests)
+    parallelism = max(1.0, sum(duration for _, duration, _ in requests) / span) if span > 0 else 1.0
+    return {'requests': count, 'overhead': overhead, 'per_char': per_char, 'parallelism': parallelism}
+
+# Función para estimar los segundos que tardarían unos lotes (lista de caracteres de cada uno)
+def estimate_seconds(batch_characters, throughput):
+    total = sum(throughput['overhead'] + throughput['per_char'] * chars for chars in batch_characters)
+    return total / throughput['parallelism']
@@ -1,72 +1,207 @@
-import re
-
-def process_non_index_file(file_path, input_language, output_language, translate_text):
-    # Leer el archivo y procesar línea por línea
-    with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-    
-    # Lista para almacenar el contenido traducido
-    translated_lines = []
-    
-    # Líneas que deben ser respetadas (1, 3, 5, 6, 7) – indexadas desde 1
-    lines_to_skip = {1, 3, 5, 6, 7}  # Usamos un conjunto para mejorar la eficiencia de la búsqueda
-    
-    # Variable para controlar si estamos dentro de un bloque de código
-    inside_code_block = False
-
-    # Función para restaurar el formato del título (sin espacios entre # y el título)
-    def restore_title_format(line):
-        # Buscar líneas que empiecen con 1 a 5 #
-        match = re.match(r"^(#{1,5})\s*(.*)$", line)  # Buscar títulos de 1 a 5 #
-        if match:
-            hashes = match.group(1)  # El símbolo # o los símbolos #
-            title = match.group(2).strip()  # El texto del título
-            return f"{hashes}{title}\n"  # Restauramos el formato sin espacios entre los # y el título
-        return line
-
-    # Función para reemplazar el símbolo ♪ ♪ por el número adecuado de #
-    def replace_music_notes_with_hashes(line):
-        # Buscamos el patrón ♪ ♪ (se puede repetir uno o más veces)
-        pattern = r"(♪\s*){2,}"  # Buscamos 2 o más símbolos ♪
-        match = re.search(pattern, line)
-        
-        if match:
-            num_of_notes = len(match.group(0).strip().split())  # Contamos cuántos ♪ hay
-            num_of_hashes = num_of_notes + 1  # Añadimos 1 al número de ♪ para obtener los # correspondientes
-            line = line.replace(match.group(0), "#" * num_of_hashes + " ")  # Reemplazamos los ♪ por # y añadimos un espacio
-        
-        return line
-
-    # Procesar cada línea y traducir
-    for idx, line in enumerate(lines, start=1):  # Usamos enumerate para contar las líneas
-        stripped_line = line.strip()  # Eliminar saltos de línea y espacios innecesarios
-        
-        # Detectar si estamos dentro de un bloque de código
-        if stripped_line.startswith("```"):  # Inicio o fin del bloque de código
-            inside_code_block = not inside_code_block  # Cambiar el estado de si estamos dentro de un bloque de código
-            translated_lines.append(line)  # Añadir la línea tal cual (inicia o termina el bloque de código)
-        elif inside_code_block:  # Si estamos dentro de un bloque de código, no traducir
-            translated_lines.append(line)  # Añadir la línea tal cual
-        elif line.lstrip().startswith("![]("):  # Si la línea comienza con ![](
-            translated_lines.append(line)  # Añadirla tal cual está, no traducirla
-        elif idx in lines_to_skip:  # Si la línea es una de las que debemos respetar
-            translated_lines.append(line)  # Añadirla tal cual está
-        elif stripped_line:  # Si la línea no está vacía y no es una de las anteriores
-            translated_line = translate_text(line, input_language, output_language)
-            translated_lines.append(translated_line)  # Añadir la línea traducida tal cual
-        else:
-            translated_lines.append(line)  # Respetar la línea vacía y añadirla tal cual
-    
-    # Restaurar el formato de los títulos en el archivo traducido
-    translated_lines = [restore_title_format(line) for line in translated_lines]
-    
-    # Reemplazar el símbolo ♪ ♪ por el número adecuado de #
-    translated_lines = [replace_music_notes_with_hashes(line) for line in translated_lines]
-    
-    # Escribir el contenido traducido en un nuevo archivo
-    translated_file_path = file_path.with_suffix(f'.{output_language}.md')
-    
-    with open(translated_file_path, 'w', encoding='utf-8') as translated_file:
-        translated_file.write("".join(translated_lines))  # Usamos "".join() para mantener los saltos de línea originales
-    
-    print(f"Archivo traducido guardado como: {translated_file_path}")
\ No newline at end of file
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from hashes import block_hash, file_hash_and_mtime
+from manifest import PreviousSegments, decode_segments, encode_segments
+from metrics import stage
+from segmenter import mask_inline, restore_block, segment_markdown
+from writer import replace_if_changed
+
+# Campos del front matter de los posts que se traducen por defecto
+FRONT_MATTER_FIELDS = ('title', 'description', 'summary')
+
+# Bloques que se leen, se envían juntos al traductor y se escriben en cada paso
+WINDOW_SIZE = 200
+
+# output_languages puede ser un idioma o una lista de idiomas: el archivo se lee y se divide en
+# bloques una sola vez y cada ventana de bloques se traduce a todos los idiomas en paralelo
+# (archivo.<idioma>.md). El archivo se procesa por ventanas de WINDOW_SIZE bloques que se escriben
+# en un archivo temporal en cuanto están traducidas, así la memoria no crece con el tamaño del
+# archivo; al terminar, el temporal sustituye al archivo traducido si su contenido ha cambiado.
+# Si se pasa un manifiesto (manifest.Manifest), los bloques que no han cambiado desde la última
+# traducción se copian del archivo traducido existente en lugar de volver a traducirlos.
+# Si se pasa un diario (journal.TranslationJournal), cada ventana de bloques traducidos se anota
+# en él y una ejecución interrumpida continúa desde el último bloque anotado.
+# Si se pasan métricas (metrics.Metrics) se anota la duración de cada etapa
+def process_non_index_file(file_path, input_language, output_languages, translate_batch, manifest=None,
+                           front_matter_fields=FRONT_MATTER_FIELDS, journal=None, metrics=None):
+    if isinstance(output_languages, str):
+        output_languages = [output_languages]
+
+    with stage(metrics, 'read', file=file_path.name):
+        source_hash, source_mtime = file_hash_and_mtime(file_path)
+
+    outputs = []
+    executor = ThreadPoolExecutor(max_workers=len(output_languages)) if len(output_languages) > 1 else None
+
+    # Función para traducir una ventana de bloques a un idioma y escribirla en su archivo temporal
+    def translate_window(output, window):
+        # Reunir los bloques que hay que traducir; los demás se reutilizan o se copian tal cual
+        pending = [i for i, (_, _, block_hash, _, _) in enumerate(window)
+                   if block_hash is not None and not output.has_previous(block_hash)]
+        translations = {}
+        if pending:
+            translated = translate_batch([window[i][3] for i in pending], input_language, output.language)
+            translations = dict(zip(pending, translated))
+
+        # Una sola pasada por la ventana: arreglos de cada traducción, escritura y registro del bloque
+        completed = {}  # Bloques de la ventana que se anotan en el diario
+        with stage(metrics, 'fixup', file=file_path.name, target=output.language, blocks=len(window)):
+            for i, (block, original, block_hash, _, tokens) in enumerate(window):
+                if i in translations:
+                    text = restore_block(block, translations[i], tokens)
+                    if text is None:
+                        print(f"El traductor ha alterado el código o los enlaces de un bloque de {file_path.name}, "
+                              f"se mantiene sin traducir")
+                        output.write(None, original)
+                        output.incomplete = True  # Se volverá a intentar en la próxima ejecución
+                        continue
+                    completed[block_hash] = text
+                elif block_hash is not None:  # El bloque no ha cambiado, reutilizamos su traducción
+                    text = output.previous(block_hash)
+                else:  # Código, front matter, imágenes, líneas vacías...
+                    text = original
+                output.write(block_hash, text)
+
+        if journal is not None:
+            with stage(metrics, 'journal', file=file_path.name, target=output.language):
+                journal.append(file_path, output.language, completed)
+
+    try:
+        for output_language in output_languages:
+            outputs.append(TranslatedOutput(file_path, output_language, manifest, journal))
+
+        # Leer el archivo línea a línea y dividirlo en bloques de Markdown (párrafos, títulos,
+        # elementos de lista...) que se procesan por ventanas
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for window in read_windows(segment_markdown(file, front_matter_fields), metrics, file_path.name):
+                if executor is None:
+                    translate_window(outputs[0], window)
+                    continue
+                futures = [executor.submit(translate_window, output, window) for output in outputs]
+                for future in futures:
+                    future.result()
+
+        for output in outputs:
+            with stage(metrics, 'write', file=file_path.name, target=output.language):
+                changed = output.commit(source_hash, source_mtime)
+            if changed:
+                print(f"Archivo traducido guardado como: {output.path}")
+            else:
+                print(f"Archivo traducido sin cambios: {output.path}")
+    finally:
+        for output in outputs:
+            output.discard()
+        if executor is not None:
+            executor.shutdown()
+
+# Función para agrupar los bloques en ventanas de WINDOW_SIZE, preparando cada bloque una sola vez
+# para todos los idiomas: texto original, hash y texto con marcadores (el código en línea, las URLs
+# y los destinos de los enlaces no se envían al traductor)
+def read_windows(blocks, metrics=None, file_name=None):
+    blocks = iter(blocks)
+    while True:
+        with stage(metrics, 'segment', file=file_name) as fields:
+            window = []
+            for block in blocks:
+                original = block.prefix + block.text + block.suffix
+                if block.kind == 'raw':
+                    window.append((block, original, None, None, None))
+                else:
+                    masked_text, tokens = mask_inline(block.text)
+                    window.append((block, original, block_hash(original), masked_text, tokens))
+                if len(window) >= WINDOW_SIZE:
+                    break
+            fields['blocks'] = len(window)
+        if not window:
+            return
+        yield window
+
+# Archivo traducido a un idioma que se va escribiendo por ventanas
+# Escribe en un archivo temporal junto al definitivo y calcula sobre la marcha su hash y la
+# longitud de cada bloque para el manifiesto; commit() lo coloca en su sitio con os.replace (ver writer.py).
+# La lista de bloques también se va escribiendo (en memoria mientras es pequeña y en un archivo
+# temporal cuando crece), así la memoria no crece con el tamaño del archivo
+class TranslatedOutput:
+    def __init__(self, file_path, language, manifest=None, journal=None):
+        self.file_path = file_path
+        self.language = language
+        self.manifest = manifest
+        self.journal = journal
+        self.path = file_path.with_suffix(f'.{language}.md')
+        self.temp_path = self.path.with_name(self.path.name + '.tmp')
+
+        # Traducciones de la ejecución anterior que se pueden reutilizar
+        self.previous_segments = PreviousSegments()
+        if manifest is not None:
+            self.previous_segments = manifest.previous_segments(file_path, self.path, language)
+        self.journaled = journal.get(file_path, language) if journal is not None else {}
+
+        self.file = open(self.temp_path, 'w', encoding='utf-8', newline='')
+        self.digest = hashlib.sha256()
+        self.segments = None  # Bloques ya escritos [hash del bloque de origen o None si no está traducido, longitud]
+        self.last_segment = None  # Último bloque, que aún puede crecer con los siguientes sin traducir
+        if manifest is not None:
+            self.segments = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode='w+', encoding='utf-8')
+        self.incomplete = False  # Si algún bloque traducible se ha quedado sin traducir
+
+    # Función para saber si hay una traducción anterior de un bloque
+    def has_previous(self, block_hash):
+        return block_hash in self.journaled or block_hash in self.previous_segments
+
+    # Función para obtener la traducción anterior de un bloque
+    def previous(self, block_hash):
+        if block_hash in self.journaled:
+            return self.journaled[block_hash]
+        return self.previous_segments[block_hash]
+
+    # Función para escribir un bloque; los bloques seguidos sin traducir se registran como uno solo
+    # Solo se guarda el hash y la longitud de cada bloque, y solo si hay manifiesto
+    def write(self, block_hash, text):
+        self.file.write(text)
+        self.digest.update(text.encode('utf-8'))
+        if self.manifest is None:
+            return
+        if block_hash is None and self.last_segment is not None and self.last_segment[0] is None:
+            self.last_segment[1] += len(text)
+            return
+        if self.last_segment is not None:
+            self.segments.writelines(encode_segments([self.last_segment]))
+        self.last_segment = [block_hash, len(text)]
+
+    # Función para generar los bloques escritos, en orden, para el manifiesto
+    def _written_segments(self):
+        self.segments.seek(0)
+        yield from decode_segments(self.segments)
+        if self.last_segment is not None:
+            yield self.last_segment
+
+    # Función para sustituir el archivo traducido por el temporal y registrar la traducción
+    # Si el contenido es el mismo que el del archivo existente no se toca; devuelve si ha cambiado.
+    # Si algún bloque se ha quedado sin traducir, el origen se registra sin hash ni mtime: así la
+    # traducción queda desactualizada y la próxima ejecución traduce de nuevo esos bloques (los
+    # demás se reutilizan)
+    def commit(self, source_hash, source_mtime):
+        self.file.close()
+        self.previous_segments.close()
+        changed = replace_if_changed(self.temp_path, self.path, self.digest.hexdigest())
+
+        # Registrar qué parte del archivo traducido corresponde a cada bloque de origen
+        if self.manifest is not None:
+            if self.incomplete:
+                source_hash, source_mtime = None, None
+            self.manifest.record(self.file_path, self.language, source_hash, source_mtime, self.digest.hexdigest(),
+                                 self._written_segments())
+        if self.journal is not None:
+            self.journal.complete(self.file_path, self.language)
+        return changed
+
+    # Función para borrar el archivo temporal si no se ha llegado a usar (por ejemplo, tras un error)
+    def discard(self):
+        self.file.close()
+        self.previous_segments.close()
+        if self.segments is not None:
+            self.segments.close()
+        if self.temp_path.exists():
+            os.remove(self.temp_path)
@@ -1,24 +1,22 @@
-import requests
 import os
+from backends import TranslationError, create_backend
+from writer import write_if_changed
 
 # Configuración de la API de LibreTranslate
 API_URL = "http://localhost:5000/translate"
 SOURCE_LANGUAGE = "es"  # Idioma de origen (inglés)
 TARGET_LANGUAGE = "en"  # Idioma de destino (español)
+BACKEND = "http"  # Motor de traducción: "http" (LibreTranslate en API_URL), "argos" o "stub" (ver backends.py)
 
-# Función para traducir el contenido usando la API
+# Motor de traducción compartido (con "http", cliente con pool de conexiones keep-alive)
+backend = create_backend(BACKEND, API_URL)
+
+# Función para traducir el contenido con el motor de traducción; devuelve None si falla
 def translate_text(text, source_lang, target_lang):
-    response = requests.post(API_URL, data={
-        'q': text,
-        'source': source_lang,
-        'target': target_lang,
-        'format': 'text'
-    })
-    
-    if response.status_code == 200:
-        return response.json()['translatedText']
-    else:
-        print(f"Error al traducir: {response.status_code}")
+    try:
+        return backend.translate_text(text, source_lang, target_lang, fmt='text')
+    except TranslationError as error:
+        print(f"Error al traducir: {error}")
         return None
 
 # Función para traducir archivos Markdown
@@ -29,9 +27,11 @@ def translate_markdown_file(input_file, output_file):
     translated_content = translate_text(markdown_content, SOURCE_LANGUAGE, TARGET_LANGUAGE)
     
     if translated_content:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(translated_content)
-        print(f"Archivo traducido guardado en: {output_file}")
+        # Escritura atómica que no toca el archivo si la traducción no ha cambiado
+        if write_if_changed(output_file, translated_content):
+            print(f"Archivo traducido guardado en: {output_file}")
+        else:
+            print(f"Archivo traducido sin cambios: {output_file}")
     else:
         print("No se pudo traducir el archivo.")
 
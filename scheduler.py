@@ -0,0 +1,97 @@
+import heapq
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from post import FRONT_MATTER_FIELDS
+from segmenter import segment_markdown
+
+# Órdenes en los que se pueden traducir los archivos
+# 'mtime': primero los modificados más recientemente (lo último que se ha escrito se publica antes)
+# 'segments': primero los que tienen menos bloques que traducir (shortest job first)
+# 'name': por ruta, en orden alfabético
+POLICIES = ('mtime', 'segments', 'name')
+
+# Prioridad de los archivos que cambian mientras se traduce: pasan delante de todos los demás
+URGENT = 0
+
+# Función para contar los bloques de un archivo que se envían al traductor
+def file_segments(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return sum(1 for block in segment_markdown(file, FRONT_MATTER_FIELDS) if block.kind != 'raw')
+
+# Función para calcular la prioridad de un archivo según policy (las menores se traducen antes)
+# Los archivos de priority_paths van delante del resto, en el orden en que aparecen. mtime es el
+# del archivo si ya se conoce (del índice de contenido), para no volver a consultarlo
+def file_priority(file_path, file_languages, policy='mtime', priority_paths=(), mtime=None):
+    if file_path in priority_paths:
+        return (1, priority_paths.index(file_path))
+    if policy == 'mtime':
+        return (2, -(mtime if mtime is not None else os.stat(file_path).st_mtime))
+    if policy == 'segments':
+        return (2, file_segments(file_path) * len(file_languages))
+    if policy == 'name':
+        return (2, str(file_path))
+    raise ValueError(f"Orden de traducción desconocido: {policy} (opciones: {', '.join(POLICIES)})")
+
+# Cola de trabajos con prioridad que se ejecutan en un número limitado de hilos
+# Cada trabajo es una función sin argumentos identificada por una clave (la ruta del archivo). Si se
+# vuelve a añadir una clave que sigue en la cola, el trabajo nuevo sustituye al anterior con su
+# nueva prioridad; si ya se está ejecutando, se ejecuta otra vez cuando termine (nunca hay dos
+# trabajos con la misma clave a la vez). Los trabajos en curso no se interrumpen: un trabajo
+# urgente pasa delante de toda la cola y empieza en cuanto queda un hilo libre
+class JobScheduler:
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.heap = []  # [prioridad, orden de llegada, clave, trabajo o None si se ha sustituido]
+        self.queued = {}  # {clave: entrada del montículo}
+        self.waiting = {}  # {clave: entrada} de los trabajos que esperan a que termine el de su clave
+        self.counter = itertools.count()
+
+    # Función para añadir un trabajo a la cola con una prioridad (tupla o número; menor = antes)
+    def push(self, key, job, priority):
+        if not isinstance(priority, tuple):
+            priority = (priority,)
+        previous = self.queued.pop(key, None)
+        if previous is not None:
+            previous[-1] = None  # Se descarta al sacarlo del montículo
+        self.waiting.pop(key, None)
+        entry = [priority, next(self.counter), key, job]
+        self.queued[key] = entry
+        heapq.heappush(self.heap, entry)
+
+    # Función para sacar de la cola la entrada más prioritaria; devuelve None si está vacía
+    def pop(self):
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            if entry[-1] is not None:
+                del self.queued[entry[2]]
+                return entry
+        return None
+
+    # Función que ejecuta los trabajos de la cola por orden de prioridad y genera (clave, future)
+    # según van terminando, hasta que la cola se vacía. Si se indica poll, se llama con el
+    # planificador cada vez que termina un trabajo o pasan poll_interval segundos, para que pueda
+    # añadir trabajos nuevos (por ejemplo, con prioridad URGENT los archivos que acaban de cambiar)
+    def run(self, poll=None, poll_interval=1.0):
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scheduler") as executor:
+            while self.queued or running:
+                while self.queued and len(running) < self.workers:
+                    entry = self.pop()
+                    key, job = entry[2], entry[3]
+                    if key in running.values():
+                        self.waiting[key] = entry
+                        continue
+                    running[executor.submit(job)] = key
+
+                done, _ = wait(running, timeout=poll_interval if poll is not None else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    if key in self.waiting:
+                        entry = self.waiting.pop(key)
+                        self.queued[key] = entry
+                        heapq.heappush(self.heap, entry)
+                    yield key, future
+                if poll is not None:
+                    poll(self)
@@ -0,0 +1,261 @@
+import itertools
+import json
+import re
+import yaml
+from collections import namedtuple
+from front_matter import BOUNDARY_RE, YAML_LOADER, load_header
+
+# Bloque de Markdown: prefix + text + suffix reproduce exactamente el texto original.
+# Solo 'text' se envía al traductor; kind indica el tipo de bloque y 'raw' se copia tal cual
+Block = namedtuple('Block', 'kind prefix text suffix')
+
+FENCE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+HEADING_RE = re.compile(r'^(\s{0,3}#{1,6}[ \t]+)(.*?)([ \t]*\n?)$')
+LIST_ITEM_RE = re.compile(r'^(\s*(?:[-*+]|\d+[.)])[ \t]+(?:\[[ xX]\][ \t]+)?)(.*?)(\n?)$')
+QUOTE_RE = re.compile(r'^(\s*(?:>[ \t]?)+)(.*?)(\n?)$')
+TABLE_DELIMITER_RE = re.compile(r'^\s*\|?(\s*:?-+:?\s*\|)+\s*(:?-+:?\s*)?\n?$')
+TABLE_CELL_RE = re.compile(r'(\|[ \t]*)([^|]*?)(?=[ \t]*(?:\||\n?$))')
+RAW_LINE_RE = re.compile(
+    r'^\s*(?:!\[[^\]]*\]\([^)]*\)\s*$'   # Imágenes en su propia línea
+    r'|<|\{\{[<%]'                      # HTML y shortcodes de Hugo
+    r'|([-*_])(?:[ \t]*\1){2,}\s*$'     # Separadores --- *** ___
+    r'|=+\s*$)'                          # Subrayado de títulos ===
+)
+FRONT_MATTER_RE = re.compile(r'^([A-Za-z_][\w-]*:[ \t]*)(["\']?)(.*?)\2([ \t]*\n?)$')
+TOML_BOUNDARY_RE = re.compile(r'^\+{3}\s*$')  # Delimitador del front matter TOML de Hugo
+
+# Elementos en línea que no se deben traducir: código, destinos de enlaces, URLs y shortcodes de Hugo
+INLINE_RE = re.compile(
+    r'(`+).+?\1'                                # `código en línea`
+    r'|(?<=\])\([^)\s]*(?:\s+"[^"]*")?\)'       # (destino "título") de [texto](destino)
+    r'|<https?://[^>]+>'                        # <https://autoenlace>
+    r'|https?://[^\s<>()\[\]`]+[^\s<>()\[\].,;:!?`]'  # URLs sueltas
+    r'|\{\{[<%].*?[%>]\}\}'                     # {{< shortcode >}}
+)
+PLACEHOLDER_RE = re.compile(r'<code>\s*(\d+)\s*</code>', re.IGNORECASE)
+
+# Función para dividir un archivo Markdown en bloques traducibles
+# Recibe las líneas del archivo (con su salto de línea) y genera los bloques en orden: los
+# párrafos, elementos de lista, títulos y celdas de tabla salen como un único segmento cada uno,
+# y el front matter, los bloques de código, las imágenes y el HTML se copian tal cual. De los
+# campos del front matter solo se traducen los valores de front_matter_fields (ver segment_front_matter)
+def segment_markdown(lines, front_matter_fields=()):
+    paragraph = None  # [prefijo, líneas] del párrafo o elemento de lista en curso
+    fence = None  # Marcador del bloque de código abierto (``` o ~~~)
+    in_list = False  # Las líneas sangradas dentro de una lista no son código
+
+    # Front matter al principio del archivo (como python-frontmatter, tras las líneas vacías iniciales)
+    lines = iter(lines)
+    for line in lines:
+        if line.strip():
+            lines = itertools.chain([line], lines)
+            break
+        yield Block('raw', '', line, '')
+    opening = next(lines, None)
+    if opening is not None:
+        boundary = BOUNDARY_RE if BOUNDARY_RE.match(opening) else \
+            TOML_BOUNDARY_RE if TOML_BOUNDARY_RE.match(opening) else None
+        header, closing = [], None
+        if boundary is not None:
+            for line in lines:
+                if boundary.match(line):
+                    closing = line
+                    break
+                header.append(line)
+        if closing is None:  # Sin cabecera completa el archivo es todo Markdown
+            lines = itertools.chain([opening], header, lines)
+        elif boundary is BOUNDARY_RE:
+            yield from segment_front_matter(opening, header, closing, front_matter_fields)
+        else:  # El front matter TOML se copia tal cual
+            for line in [opening, *header, closing]:
+                yield Block('raw', '', line, '')
+
+    def flush():
+        nonlocal paragraph
+        if paragraph is None:
+            return None
+        prefix, body = paragraph
+        paragraph = None
+        text = "".join(body)
+        stripped = text.rstrip('\n')
+        return Block('paragraph', prefix, stripped, text[len(stripped):])
+
+    for line in lines:
+        # Bloques de código: se copian tal cual hasta el cierre
+        fence_match = FENCE_RE.match(line)
+        if fence is not None:
+            if fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                fence = None
+            yield Block('raw', '', line, '')
+            continue
+        if fence_match:
+            in_list = False
+            block = flush()
+            if block:
+                yield block
+            fence = fence_match.group(1)
+            yield Block('raw', '', line, '')
+            continue
+
+        # Líneas vacías, imágenes, HTML, shortcodes de Hugo, separadores y filas de
+        # alineación de tablas cierran el párrafo y se copian tal cual
+        if not line.strip() or RAW_LINE_RE.match(line) or TABLE_DELIMITER_RE.match(line):
+            block = flush()
+            if block:
+                yield block
+            yield Block('raw', '', line, '')
+            continue
+
+        # Código sangrado (cuatro espacios o tabulador) fuera de listas y párrafos
+        if paragraph is None and not in_list and line.startswith(('    ', '\t')):
+            yield Block('raw', '', line, '')
+            continue
+
+        heading = HEADING_RE.match(line)
+        quote = QUOTE_RE.match(line)
+        if heading or quote:
+            in_list = False
+            block = flush()
+            if block:
+                yield block
+            prefix, text, end = (heading or quote).groups()
+            yield Block('heading' if heading else 'paragraph', prefix, text, end) if text.strip() \
+                else Block('raw', '', line, '')
+            continue
+
+        # Tablas: cada celda es un segmento
+        if line.lstrip().startswith('|'):
+            block = flush()
+            if block:
+                yield block
+            yield from segment_table_row(line)
+            continue
+
+        list_item = LIST_ITEM_RE.match(line)
+        if list_item:
+            block = flush()
+            if block:
+                yield block
+            paragraph = [list_item.group(1), [list_item.group(2) + list_item.group(3)]]
+            in_list = True
+            continue
+
+        # Resto de líneas: inician un párrafo o continúan el que está abierto
+        if paragraph is None:
+            indent = line[:len(line) - len(line.lstrip())]
+            in_list = in_list and bool(indent)
+            paragraph = [indent, [line[len(indent):]]]
+        else:
+            paragraph[1].append(line)
+
+    block = flush()
+    if block:
+        yield block
+
+# Función para dividir una cabecera YAML en bloques
+# Solo se traducen los valores de front_matter_fields escritos en una sola línea cuyo texto es
+# exactamente el valor que lee YAML: escalares simples o entre comillas sin escapes. Los escalares
+# de bloque (| y >), los valores con escapes o comentarios, los que no son texto y las cabeceras que
+# no se pueden leer se copian tal cual
+def segment_front_matter(opening, header, closing, front_matter_fields):
+    try:
+        metadata = load_header(header)
+    except yaml.YAMLError:
+        metadata = {}
+
+    yield Block('raw', '', opening, '')
+    for line in header:
+        match = FRONT_MATTER_RE.match(line)
+        if match and match.group(3):
+            prefix, quote, value, end = match.groups()
+            key = prefix.split(':')[0]
+            if key in front_matter_fields and metadata.get(key) == value:
+                yield Block('front_matter', prefix + quote, value, quote + end)
+                continue
+        yield Block('raw', '', line, '')
+    yield Block('raw', '', closing, '')
+
+# Función para dividir una fila de tabla en bloques, uno por celda
+def segment_table_row(line):
+    position = 0
+    for match in TABLE_CELL_RE.finditer(line):
+        if not match.group(2):
+            continue
+        yield Block('raw', '', line[position:match.start(2)], '')
+        yield Block('table_cell', '', match.group(2), '')
+        position = match.end(2)
+    yield Block('raw', '', line[position:], '')
+
+# Función para sustituir por marcadores los elementos en línea que no se deben traducir
+# Devuelve el texto con marcadores <code>N</code> (que LibreTranslate deja intactos en
+# formato html) y la lista de textos originales
+def mask_inline(text):
+    tokens = []
+
+    def replace(match):
+        tokens.append(match.group(0))
+        return f'<code>{len(tokens) - 1}</code>'
+
+    return INLINE_RE.sub(replace, text), tokens
+
+# Función para volver a colocar los elementos en línea en el texto traducido
+# Devuelve None si el traductor ha perdido o duplicado algún marcador
+def unmask_inline(text, tokens):
+    found = []
+
+    def replace(match):
+        idx = int(match.group(1))
+        found.append(idx)
+        return tokens[idx] if idx < len(tokens) else match.group(0)
+
+    text = PLACEHOLDER_RE.sub(replace, text)
+    if sorted(found) != list(range(len(tokens))):
+        return None
+    return text
+
+# Función para saber si una traducción conserva los marcadores <code>N</code> del texto original
+# (los mismos, sin perder ni duplicar ninguno)
+def same_placeholders(text, translation):
+    return sorted(PLACEHOLDER_RE.findall(text), key=int) == sorted(PLACEHOLDER_RE.findall(translation), key=int)
+
+# Función para montar un bloque con su texto traducido
+# Los valores del front matter se escriben con las comillas del original y se comprueba que YAML
+# vuelve a leer exactamente el texto traducido; si no, se escriben entre comillas dobles con escapes
+def render_block(block, text):
+    if block.kind == 'front_matter':
+        quote = block.prefix[-1:] if block.prefix[-1:] in ('"', "'") else ''
+        head, tail = block.prefix[:len(block.prefix) - len(quote)], block.suffix[len(quote):]
+        return head + render_scalar(text, quote) + tail
+    elif block.kind in ('heading', 'table_cell'):
+        text = text.replace('\n', ' ')
+    return block.prefix + text + block.suffix
+
+# Función para escribir un valor de texto de YAML en una línea con las comillas del original ('', ' o ")
+# Si YAML no vuelve a leer exactamente el texto, se escribe entre comillas dobles con escapes
+def render_scalar(text, quote):
+    text = text.replace('\n', ' ')
+    if quote == "'":
+        value = "'" + text.replace("'", "''") + "'"
+    elif quote == '"':
+        value = json.dumps(text, ensure_ascii=False)  # Las comillas dobles de YAML admiten los escapes de JSON
+    else:
+        value = text
+    if not yaml_round_trips('key: ' + value, 'key', text):
+        value = json.dumps(text, ensure_ascii=False)
+    return value
+
+# Función para comprobar que una línea del front matter se lee en YAML como {key: text}
+def yaml_round_trips(line, key, text):
+    try:
+        return yaml.load(line, Loader=YAML_LOADER) == {key: text}
+    except yaml.YAMLError:
+        return False
+
+# Función para aplicar de una vez todos los arreglos a la traducción de un bloque: volver a colocar
+# los elementos en línea y montar el bloque con su prefijo y sufijo
+# Devuelve None si el traductor ha perdido o duplicado algún marcador
+def restore_block(block, translation, tokens):
+    text = unmask_inline(translation, tokens)
+    if text is None:
+        return None
+    return render_block(block, text)
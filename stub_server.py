@@ -0,0 +1,103 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from backends import stub_translate
+
+# Servidor de pruebas que imita la API de LibreTranslate (/translate y /languages) sin cargar
+# ningún modelo. La "traducción" (backends.stub_translate, la misma que la de backends.StubBackend)
+# es determinista y respeta los marcadores <code>N</code>, así que sirve para medir el rendimiento
+# del script y comprobar sus resultados sin red ni GPU.
+# Uso: python stub_server.py --port 5000 --latency 0.05
+
+# Función para crear la clase que atiende las peticiones con la configuración indicada
+def make_handler(latency=0.0, char_latency=0.0, error_rate=0.0):
+    stats = {'requests': 0, 'segments': 0, 'characters': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith('/languages'):
+                self.send_json(200, [{'code': 'es', 'name': 'Spanish'}, {'code': 'en', 'name': 'English'}])
+            elif self.path.startswith('/stats'):
+                with lock:
+                    self.send_json(200, dict(stats))
+            else:
+                self.send_json(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if not self.path.startswith('/translate'):
+                self.send_json(404, {'error': 'Not found'})
+                return
+
+            # LibreTranslate acepta el cuerpo en JSON o como formulario
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                data = {key: values[0] if len(values) == 1 else values
+                        for key, values in parse_qs(raw.decode('utf-8')).items()}
+
+            texts = data.get('q')
+            texts_list = texts if isinstance(texts, list) else [texts]
+            if texts is None or 'target' not in data:
+                self.send_json(400, {'error': "Invalid request: missing 'q' or 'target' parameter"})
+                return
+
+            characters = sum(len(text) for text in texts_list)
+            with lock:
+                stats['requests'] += 1
+                stats['segments'] += len(texts_list)
+                stats['characters'] += characters
+
+            if error_rate and random.random() < error_rate:
+                with lock:
+                    stats['errors'] += 1
+                self.send_json(503, {'error': 'Server busy'})
+                return
+
+            time.sleep(latency + char_latency * characters)
+            translations = [stub_translate(text, data.get('source'), data['target']) for text in texts_list]
+            self.send_json(200, {'translatedText': translations if isinstance(texts, list) else translations[0]})
+
+    return StubHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de pruebas compatible con la API de LibreTranslate")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000, help="Puerto (0 para elegir uno libre)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Segundos de espera por petición")
+    parser.add_argument('--char-latency', type=float, default=0.0, help="Segundos de espera por carácter")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de peticiones que responden 503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(args.latency, args.char_latency, args.error_rate))
+    server.daemon_threads = True
+    # La primera línea indica la URL, así quien lanza el servidor sabe cuándo está listo y en qué puerto
+    print(f"http://{args.host}:{server.server_address[1]}/translate", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import pytest
+from backends import StubBackend, TranslationError
+from front_matter import read_front_matter
+from journal import TranslationJournal
+from manifest import Manifest
+import post
+from post import process_non_index_file
+from segmenter import mask_inline, restore_block, segment_markdown
+
+# Comprobaciones de que dividir un post en bloques y volver a montarlo reproduce el archivo byte a
+# byte: de eso dependen la reutilización de segmentos del manifiesto y la recuperación del diario
+
+CASES = {
+    'markdown': (
+        "# Título con `código`\n\n"
+        "Un párrafo con [un enlace](https://example.com \"título\") y una URL https://example.com/a.\n"
+        "Sigue en otra línea con {{< shortcode arg >}}.\n\n"
+        "- Elemento de lista\n"
+        "  - [x] Tarea hecha\n"
+        "1. Numerado\n\n"
+        "> Cita\n\n"
+        "| Columna | Otra |\n"
+        "|:-------|-----:|\n"
+        "| celda `x` | dos |\n\n"
+        "```python\n"
+        "print('sin traducir')\n"
+        "```\n\n"
+        "    código sangrado\n\n"
+        "![imagen](img.png)\n"
+        "<div>html</div>\n"
+        "---\n"
+        "Último párrafo sin salto final"
+    ),
+    'front_matter': (
+        "\n"
+        "---\n"
+        "title: Hola mundo\n"
+        "description: 'Entre comillas'\n"
+        "summary: \"Con \\\"escapes\\\"\"\n"
+        "tags: [uno, dos]\n"
+        "draft: true\n"
+        "---\n"
+        "Texto.\n"
+    ),
+    'front_matter_untranslatable': (
+        "---\n"
+        "title: >\n"
+        "  Plegado\n"
+        "  en dos líneas\n"
+        "description: Con comentario  # nota\n"
+        "summary: 2024\n"
+        "---\n"
+        "Texto.\n"
+    ),
+    'toml': "+++\ntitle = \"Hola\"\n+++\nTexto.\n",
+    'unclosed_front_matter': "---\ntitle: Hola\nTexto sin cierre.\n",
+    'crlf': "---\r\ntitle: Hola\r\n---\r\nUn párrafo\r\nen dos líneas.\r\n\r\n## Título\r\n",
+}
+
+FIELDS = ('title', 'description', 'summary')
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_segments_round_trip(name):
+    text = CASES[name]
+    blocks = list(segment_markdown(text.splitlines(keepends=True), FIELDS))
+    assert "".join(block.prefix + block.text + block.suffix for block in blocks) == text
+
+    # Una "traducción" que devuelve el texto con marcadores tal cual debe dejar cada bloque igual
+    for block in blocks:
+        if block.kind != 'raw':
+            masked, tokens = mask_inline(block.text)
+            assert restore_block(block, masked, tokens) == block.prefix + block.text + block.suffix
+
+def test_restore_rejects_lost_placeholder():
+    block = next(segment_markdown(["Usa `x` y `y`.\n"]))
+    masked, tokens = mask_inline(block.text)
+    assert restore_block(block, masked.replace('<code>0</code>', ''), tokens) is None
+
+def test_translated_front_matter_loads(tmp_path):
+    source = tmp_path / 'post.md'
+    source.write_text(CASES['front_matter'], encoding='utf-8')
+    process_non_index_file(source, 'es', 'en', StubBackend().translate_batch)
+
+    metadata = read_front_matter(tmp_path / 'post.en.md')
+    assert metadata['title'] == '[en] HOLA MUNDO'
+    assert metadata['description'] == '[en] ENTRE COMILLAS'
+    assert "description: '[en] ENTRE COMILLAS'\n" in (tmp_path / 'post.en.md').read_text(encoding='utf-8')
+    assert metadata['summary'] == 'Con "escapes"'  # Con escapes: se copia tal cual
+    assert metadata['tags'] == ['uno', 'dos']
+
+# Motor de pruebas que anota los segmentos que se le envían
+class RecordingBackend(StubBackend):
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.sent = []
+        self.fail_after = fail_after
+
+    def translate_segments(self, segments, source, target, fmt):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise TranslationError("Interrumpido")
+        self.sent += segments
+        return super().translate_segments(segments, source, target, fmt)
+
+PARAGRAPHS = [f"Párrafo `{i}` número {i}." for i in range(6)]
+
+def write_post(path, paragraphs):
+    path.write_text("---\ntitle: Hola\n---\n\n" + "\n\n".join(paragraphs) + "\n", encoding='utf-8')
+
+# Traducción de referencia de un post, sin manifiesto ni diario
+def fresh_translation(tmp_path, paragraphs):
+    directory = tmp_path / 'fresh'
+    directory.mkdir()
+    write_post(directory / 'post.md', paragraphs)
+    process_non_index_file(directory / 'post.md', 'es', 'en', StubBackend().translate_batch)
+    return (directory / 'post.en.md').read_text(encoding='utf-8')
+
+def test_manifest_reuses_unchanged_segments(tmp_path):
+    content = tmp_path / 'content'
+    content.mkdir()
+    source = content / 'post.md'
+    write_post(source, PARAGRAPHS)
+    manifest = Manifest(tmp_path / 'manifest.json', content)
+    process_non_index_file(source, 'es', 'en', StubBackend().translate_batch, manifest)
+    manifest.save()
+
+    edited = PARAGRAPHS[:2] + ["Un párrafo nuevo."] + PARAGRAPHS[3:]
+    write_post(source, edited)
+    backend = RecordingBackend()
+    process_non_index_file(source, 'es', 'en', backend.translate_batch, Manifest(tmp_path / 'manifest.json', content))
+
+    assert backend.sent == ["Un párrafo nuevo."]
+    assert (content / 'post.en.md').read_text(encoding='utf-8') == fresh_translation(tmp_path, edited)
+
+def test_journal_resumes_interrupted_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(post, 'WINDOW_SIZE', 8)  # Varias ventanas en un post pequeño
+    source = tmp_path / 'post.md'
+    write_post(source, PARAGRAPHS)
+
+    journal = TranslationJournal(tmp_path / 'journal.jsonl')
+    with pytest.raises(TranslationError):
+        process_non_index_file(source, 'es', 'en', RecordingBackend(fail_after=1).translate_batch, journal=journal)
+    journal.close()
+    assert not (tmp_path / 'post.en.md').exists()
+
+    journal = TranslationJournal(tmp_path / 'journal.jsonl')
+    backend = RecordingBackend()
+    process_non_index_file(source, 'es', 'en', backend.translate_batch, journal=journal)
+    journal.compact()
+    journal.close()
+
+    # La primera ventana (título y dos párrafos) sale del diario; solo se traduce el resto
+    assert backend.sent == [mask_inline(text)[0] for text in PARAGRAPHS[2:]]
+    assert (tmp_path / 'post.en.md').read_text(encoding='utf-8') == fresh_translation(tmp_path, PARAGRAPHS)
+    assert (tmp_path / 'journal.jsonl').read_text(encoding='utf-8') == ''
@@ -1,107 +1,400 @@
-import json
-import requests
+import argparse
+import os
+import time
+from functools import partial
 from pathlib import Path
-from index import process_index_file
+from cache import TranslationMemory
+from backends import create_backend
+from content_index import scan_content
+from index import process_index_files
+from journal import TranslationJournal
+from manifest import Manifest
+from metrics import Metrics, stage
+from planner import LanguagePlan, estimate_seconds, index_texts, load_throughput, post_calls
 from post import process_non_index_file
+from scheduler import URGENT, JobScheduler, file_priority
+from watcher import WATCHDOG, ContentWatcher
 
 # VARIABLES
 input_language = 'es'
-output_language = 'en'
-url = "http://localhost:5000/translate"
+output_languages = ['en']  # Idiomas a los que se traduce; cada archivo se lee una vez para todos
+# Motor de traducción: 'http' (instancias de LibreTranslate en urls), 'argos' (modelos de Argos
+# Translate cargados en este proceso, sin servidor) o 'stub' (traducción de pruebas, ver backends.py)
+translation_backend = 'http'
+argos_device = 'cpu'  # Con translation_backend = 'argos', dispositivo de CTranslate2 ('cpu' o 'cuda')
+# Instancias de LibreTranslate; los lotes se reparten entre las que responden
+urls = ["http://localhost:5000/translate"]
+batch_char_limit = 10000  # Máximo de caracteres por petición (debe respetar el --char-limit del servidor)
+batch_size_limit = None  # Máximo de segmentos por petición (--batch-limit del servidor), None para no limitar
+pool_size = 10  # Conexiones keep-alive que se mantienen abiertas con el servidor
+request_timeout = (5, 120)  # Tiempo máximo (conexión, lectura) en segundos de cada petición
+max_in_flight = 8  # Peticiones simultáneas como máximo contra cada instancia (el cliente ajusta las reales por debajo)
+max_files_in_flight = 4  # Archivos que se procesan a la vez
+max_retries = 5  # Reintentos de una petición cuando el servidor está caído o sobrecargado (429/5xx)
+retry_base_delay = 0.5  # Espera base en segundos entre reintentos (crece exponencialmente, con jitter)
+retry_max_delay = 30  # Espera máxima en segundos entre reintentos
+target_latency = None  # Latencia en segundos a partir de la cual se reducen las peticiones en curso
+breaker_threshold = 5  # Errores de conexión o timeouts seguidos tras los que se deja de llamar al servidor
+breaker_cooldown = 30  # Segundos sin llamar al servidor antes de volver a probar
+health_check_interval = 10  # Segundos entre comprobaciones de que cada instancia responde, None para no comprobar
+cache_path = Path(__file__).with_name('translation_memory.sqlite')  # Memoria de traducción, None para desactivarla
+cache_max_entries = 200000  # Entradas máximas de la memoria antes de descartar las menos usadas
 input_directory = Path('/home/javiercruces/Documentos/sentinel/content/posts')
+manifest_path = Path(__file__).with_name('translation_manifest.json')  # Hashes de origen de cada traducción
+journal_path = Path(__file__).with_name('translation_journal.jsonl')  # Bloques traducidos de la ejecución en curso
+trace_path = Path(__file__).with_name('translation_trace.jsonl')  # Traza con la duración de cada etapa, None para no guardarla
+languages = [input_language, *output_languages]  # Idiomas que manejas
+# Campos del front matter de los _index.md que se traducen ('*' es cualquier clave y 'clave[]' cada
+# elemento de una lista, por ejemplo 'tags[]'); el resto de campos se copia sin cambios
+index_fields = ['title', 'description', 'summary', 'menu.*.name']
+watch_debounce = 1.0  # Con --watch, segundos sin cambios que se esperan tras guardar un archivo antes de traducirlo
+watch_poll_interval = 2.0  # Con --watch y sin watchdog instalado, segundos entre cada recorrido del directorio
+# Orden en que se traducen los archivos: 'mtime' (los modificados más recientemente primero),
+# 'segments' (los que tienen menos bloques primero) o 'name' (por ruta)
+schedule_policy = 'mtime'
+priority_paths = []  # Archivos que se traducen antes que el resto, en este orden (rutas relativas a input_directory)
+# Si un archivo de origen se guarda durante la traducción, pasa delante de los pendientes. Solo con
+# watchdog instalado: sin él habría que recorrer el árbol entero cada watch_poll_interval segundos
+schedule_rescan = True
+
+# Objetos compartidos durante la ejecución; los crea setup() a partir de las VARIABLES
+cache = None  # Memoria de traducción persistente que se consulta antes de llamar al servidor
+backend = None  # Motor de traducción (con 'http', cliente con pool de conexiones keep-alive hacia LibreTranslate)
+manifest = None  # Manifiesto con los hashes de los archivos y segmentos ya traducidos
+journal = None  # Diario para retomar una ejecución interrumpida sin repetir los bloques ya traducidos
+metrics = None  # Duración de cada etapa y contadores de la ejecución
+
+# Función para crear los objetos compartidos de la ejecución a partir de las VARIABLES
+# Se llama desde main(); otros scripts (benchmark.py) pueden cambiar antes las variables del módulo.
+# Con connect=False no se crean el motor de traducción ni las métricas (para planificar sin tocar la traza)
+def setup(connect=True):
+    global cache, backend, manifest, journal, metrics
+
+    cache = TranslationMemory(cache_path, cache_max_entries) if cache_path else None
+    manifest = Manifest(manifest_path, input_directory)
+    journal = TranslationJournal(journal_path)
+    if not connect:
+        return
+
+    metrics = Metrics(trace_path)
+    options = {}
+    if translation_backend == 'http':
+        options = dict(pool_size=pool_size, timeout=request_timeout, char_limit=batch_char_limit,
+                       size_limit=batch_size_limit, max_in_flight=max_in_flight, max_retries=max_retries,
+                       retry_base_delay=retry_base_delay, retry_max_delay=retry_max_delay,
+                       target_latency=target_latency, breaker_threshold=breaker_threshold,
+                       breaker_cooldown=breaker_cooldown, health_check_interval=health_check_interval)
+    elif translation_backend == 'argos':
+        options = dict(device=argos_device)
+    backend = create_backend(translation_backend, urls, cache=cache, metrics=metrics, **options)
+
+# Función para cerrar los objetos compartidos al terminar
+def close():
+    journal.close()
+    if backend is not None:
+        backend.close()  # Cierra también la memoria de traducción
+    elif cache is not None:
+        cache.close()
+    if metrics is not None:
+        metrics.close()
+
+# Función para traducir varios textos con el motor de traducción (ver backends.TranslationBackend.translate_batch)
+def translate_batch(texts, input_language, output_language):
+    return backend.translate_batch(texts, input_language, output_language)
+
+# Función para listar los archivos .md de origen del índice de contenido junto con los idiomas
+# a los que hay que traducirlos, omitiendo los idiomas cuya traducción está al día
+def list_md_files(content_index, output_languages):
+    md_files = []
+
+    for file, mtime in sorted(content_index.sources.items()):
+        file_languages = []
+        for output_language in output_languages:
+            # Los archivos sin traducción se traducen siempre; los ya traducidos solo si su origen ha cambiado
+            if not content_index.has_translation(file, output_language):
+                file_languages.append(output_language)
+            elif manifest.is_outdated(file, file.with_suffix(f'.{output_language}.md'), output_language, mtime,
+                                      content_index.translations[file][output_language]):
+                file_languages.append(output_language)
+        if file_languages:
+            md_files.append((file, file_languages))
 
-# Función para traducir texto utilizando la API de LibreTranslate
-def translate_text(text, input_language, output_language):
-    if not text.strip():
-        return text
-    
-    payload = {
-        "q": text,
-        "source": input_language,
-        "target": output_language,
-        "format": "html",
-        "api_key": ""
-    }
-    headers = {"Content-Type": "application/json"}
-
-    response = requests.post(url, data=json.dumps(payload), headers=headers)
-    
-    if response.status_code == 200:
-        return response.json()['translatedText']
-    else:
-        print(f"Error con la traducción: {response.text}")
-        return text
-
-# Función para listar los archivos .md en un directorio y subdirectorios,
-# y omitir aquellos que ya están traducidos
-def list_md_files(directory, output_language):
-    path = Path(directory)
-    
-    if not path.is_dir():
-        raise ValueError(f"La ruta proporcionada no es un directorio válido: {directory}")
-    
-    # Usamos rglob para obtener todos los archivos .md
-    md_files = list(path.rglob("*.md"))
-    
-    # Filtramos para omitir archivos que ya tienen el sufijo de idioma de salida (por ejemplo, .en.md)
-    md_files = [file for file in md_files if not file.name.endswith(f'.{output_language}.md')]
-    
-    # Verificamos si el archivo traducido ya existe, si es así lo eliminamos de la lista
-    md_files = [file for file in md_files if not file.with_suffix(f'.{output_language}.md').exists()]
-    
     return md_files
 
-# Función para contar archivos de cada idioma
-def count_files_by_language(directory, languages):
-    file_count = {lang: {"total": 0, "translated": 0, "pending": 0} for lang in languages}
-    
-    for file in Path(directory).rglob("*.md"):
-        for lang in languages:
-            # Para los archivos que tienen el sufijo del idioma (por ejemplo, .en.md)
-            if file.name.endswith(f".{lang}.md"):  
-                file_count[lang]["total"] += 1
-                if file.with_suffix(f".{lang}.md").exists():
-                    file_count[lang]["translated"] += 1
-                else:
-                    file_count[lang]["pending"] += 1
-            # Si el archivo no tiene sufijo de idioma, contamos como pendiente en el idioma original
-            elif lang == 'es' and not any(file.name.endswith(f".{l}.md") for l in languages):  # Archivos sin sufijo de idioma
-                file_count[lang]["total"] += 1
-                file_count[lang]["pending"] += 1
-    
+# Función para contar, por idioma, cuántos archivos de origen tienen una traducción al día y
+# cuántos hay que traducir (md_files, de list_md_files), separando los que no tienen traducción de
+# los que la tienen desactualizada. El idioma de origen cuenta todos los archivos como traducidos
+def count_files_by_language(content_index, languages, md_files):
+    file_count = {}
+    total = len(content_index.sources)
+
+    for lang in languages:
+        pending = [file for file, file_languages in md_files if lang in file_languages]
+        missing = sum(1 for file in pending if not content_index.has_translation(file, lang))
+        file_count[lang] = {"total": total, "translated": total - len(pending), "pending": len(pending),
+                            "missing": missing, "outdated": len(pending) - missing}
+
     return file_count
 
-# Lista de archivos .md, excluyendo los que ya están traducidos
-md_files = list_md_files(input_directory, output_language)
-
-# print(f"Lista bruta: {list(Path(input_directory).rglob('*.md'))}")
-# print(f"Lista neta: {md_files}")
-
-# Estadísticas de archivos
-languages = ['es', 'en']  # Idiomas que manejas
-file_count = count_files_by_language(input_directory, languages)
-
-# Mostrar estadísticas de archivos
-print(f"Estadísticas de archivos:")
-for lang, counts in file_count.items():
-    print(f"Idioma: {lang}")
-    print(f"  Total archivos: {counts['total']}")
-    print(f"  Archivos traducidos: {counts['translated']}")
-    print(f"  Archivos pendientes de traducir: {counts['pending']}")
-    
-# Ejecutar el script
-print(f"Comenzando traducción de {input_language} a {output_language}...")
-
-# Iterar sobre los archivos .md en el directorio de entrada
-for file_path in md_files:
-
-    # Verificar si el archivo es _index.md y procesarlo con el módulo index.py
-    if file_path.name == "_index.md":
-        print(f"Procesando archivo _index.md: {file_path.name}")
-        process_index_file(file_path, input_language, output_language, translate_text)
-    else:
-        # Procesar cualquier otro archivo con el módulo post.py
-        print(f"Procesando archivo no _index.md: {file_path.name}")
-        process_non_index_file(file_path, input_language, output_language, translate_text)
-
-print(f"Traducción completada.")
\ No newline at end of file
+# Función para traducir un post a sus idiomas con el módulo post.py
+# Los _index.md se traducen todos juntos con translate_index_files
+def translate_file(file_path, file_languages):
+    print(f"Procesando archivo no _index.md: {file_path.name}")
+    process_non_index_file(file_path, input_language, file_languages, translate_batch, manifest,
+                           journal=journal, metrics=metrics)
+
+# Función para traducir un archivo y medir cuánto tarda en segundos
+def timed_translate_file(file_path, file_languages):
+    start = time.perf_counter()
+    with stage(metrics, 'file', file=str(file_path), targets=file_languages):
+        translate_file(file_path, file_languages)
+    return time.perf_counter() - start
+
+# Función para traducir todos los _index.md juntos: los textos de todos ellos se traducen sin
+# repetir en unas pocas peticiones (ver index.process_index_files)
+# Devuelve los errores de cada archivo {archivo: error} y los segundos que ha tardado
+def translate_index_files(index_files):
+    print(f"Procesando {len(index_files)} archivos _index.md a la vez")
+    start = time.perf_counter()
+    with stage(metrics, 'index_files', files=len(index_files)):
+        errors = process_index_files(index_files, input_language, translate_batch, manifest, metrics, index_fields)
+    return errors, time.perf_counter() - start
+
+# Función para traducir varios archivos a la vez, por orden de prioridad (ver scheduler.py)
+# Cada archivo se escribe por separado, así que el resultado no depende del orden de ejecución;
+# el número de peticiones simultáneas lo limita el motor de traducción (max_in_flight con el
+# cliente HTTP). Los _index.md se traducen todos juntos en una sola tarea, que va la primera; los
+# posts, según schedule_policy y con los de priority_paths delante. Si se pasa el índice de
+# contenido, schedule_rescan está activado y watchdog está instalado, los archivos de origen que se
+# guardan durante la traducción pasan delante de todos los pendientes (los _index.md, en la tarea
+# conjunta, para no escribir nunca el mismo archivo desde dos tareas a la vez).
+# Devuelve {archivo: segundos} de los archivos traducidos sin errores (para los _index.md, la
+# parte que les corresponde del tiempo de la tarea conjunta)
+def translate_files(md_files, content_index=None):
+    durations = {}
+    index_files = [(file_path, file_languages) for file_path, file_languages in md_files if file_path.name == "_index.md"]
+    posts = [(file_path, file_languages) for file_path, file_languages in md_files if file_path.name != "_index.md"]
+
+    # Función de la tarea conjunta de los _index.md; devuelve también los archivos que ha traducido
+    def index_job(files):
+        try:
+            errors, elapsed = translate_index_files(files)
+        except Exception as error:
+            errors, elapsed = {file_path: error for file_path, _ in files}, 0
+        return files, errors, elapsed
+
+    scheduler = JobScheduler(max_files_in_flight)
+    queued_index_files = dict(index_files)  # {archivo: idiomas} de la tarea 'index_files' que está en la cola
+    if index_files:
+        # (1,) va antes que cualquier prioridad de file_priority salvo URGENT
+        scheduler.push('index_files', partial(index_job, index_files), (1,))
+    paths = [input_directory / path for path in priority_paths]
+    for file_path, file_languages in posts:
+        mtime = content_index.sources.get(file_path) if content_index is not None else None
+        scheduler.push(file_path, partial(timed_translate_file, file_path, file_languages),
+                       file_priority(file_path, file_languages, schedule_policy, paths, mtime))
+
+    # Vigilar el directorio para pasar delante los archivos que se guardan mientras tanto
+    watcher = None
+    poll = None
+    if content_index is not None and schedule_rescan and not WATCHDOG:
+        print("schedule_rescan está activado pero watchdog no está instalado (pip install watchdog): "
+              "los archivos que se guarden durante la traducción no pasarán delante")
+    elif content_index is not None and schedule_rescan:
+        watcher = ContentWatcher(input_directory, watch_debounce, watch_poll_interval)
+
+        def poll(scheduler):
+            for file_path, file_languages in changed_md_files(content_index, watcher.drain()):
+                print(f"{file_path} ha cambiado, se traduce antes que los archivos pendientes")
+                if file_path.name != "_index.md":
+                    scheduler.push(file_path, partial(timed_translate_file, file_path, file_languages), URGENT)
+                    continue
+                # Añadirlo a la tarea conjunta si sigue en la cola o crear otra que espere a la que está en curso
+                if 'index_files' not in scheduler.queued and 'index_files' not in scheduler.waiting:
+                    queued_index_files.clear()
+                queued_index_files[file_path] = file_languages
+                scheduler.push('index_files', partial(index_job, list(queued_index_files.items())), URGENT)
+
+    try:
+        for key, future in scheduler.run(poll):
+            if key != 'index_files':
+                try:
+                    durations[key] = future.result()
+                except Exception as error:
+                    print(f"Error procesando {key}: {error}")
+                continue
+
+            files, errors, elapsed = future.result()
+            for file_path, _ in files:
+                if file_path in errors:
+                    print(f"Error procesando {file_path}: {errors[file_path]}")
+                else:
+                    durations[file_path] = elapsed / len(files)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+    return durations
+
+# Función para mostrar, sin llamar al servidor, qué se enviaría a traducir en la ejecución: segmentos,
+# caracteres, aciertos de la memoria y peticiones HTTP por archivo e idioma, y una estimación del
+# tiempo a partir de las peticiones de la traza de la última ejecución (trace_path)
+def plan_files(md_files):
+    plans = {lang: LanguagePlan(input_language, lang, cache, batch_char_limit, batch_size_limit)
+             for lang in output_languages}
+    totals = {lang: {'segments': 0, 'characters': 0, 'cache_hits': 0, 'batches': 0, 'batch_characters': []}
+              for lang in output_languages}
+
+    print(f"{'Archivo':<50}{'Idioma':>7}{'Segmentos':>11}{'Caracteres':>12}{'Memoria':>9}{'Lotes':>7}{'A enviar':>10}")
+    # Función para sumar el plan de unas llamadas a los totales de su idioma y mostrarlo
+    def add(name, lang, calls):
+        result = plans[lang].add(calls)
+        for key, value in result.items():
+            totals[lang][key] += value
+        print(f"{name[-49:]:<50}{lang:>7}{result['segments']:>11}{result['characters']:>12}"
+              f"{result['cache_hits']:>9}{result['batches']:>7}{sum(result['batch_characters']):>10}")
+
+    # Los textos de todos los _index.md de un idioma se traducen juntos en una sola llamada
+    index_files = {lang: [] for lang in output_languages}
+    for file_path, file_languages in md_files:
+        for lang in file_languages:
+            if file_path.name == "_index.md":
+                index_files[lang].append(file_path)
+            else:
+                add(file_path.relative_to(input_directory).as_posix(), lang,
+                    post_calls(file_path, lang, manifest, journal))
+    for lang, files in index_files.items():
+        if files:
+            texts = list(dict.fromkeys(text for file_path in files for text in index_texts(file_path, index_fields)))
+            add(f"_index.md ({len(files)} archivos)", lang, [texts])
+
+    batch_characters = []
+    for lang, total in totals.items():
+        print(f"Total {lang}: {total['segments']} segmentos, {total['characters']} caracteres, "
+              f"{total['cache_hits']} en la memoria, {total['batches']} peticiones HTTP con "
+              f"{sum(total['batch_characters'])} caracteres")
+        batch_characters += total['batch_characters']
+
+    throughput = load_throughput(trace_path) if trace_path else None
+    if throughput is None:
+        print(f"No hay peticiones en la traza {trace_path} para estimar el tiempo; "
+              f"traduce antes algunos archivos para medir el servidor")
+        return
+    seconds = estimate_seconds(batch_characters, throughput)
+    print(f"Servidor medido en {throughput['requests']} peticiones: {throughput['overhead'] * 1000:.0f} ms por "
+          f"petición + {throughput['per_char'] * 1e6:.0f} µs por carácter, {throughput['parallelism']:.1f} "
+          f"peticiones en curso de media")
+    print(f"Tiempo estimado de las peticiones: {seconds / 60:.1f} minutos ({seconds:.1f}s)")
+
+# Función para actualizar el índice de contenido con unos archivos que han cambiado (creados,
+# modificados o borrados) y obtener los de origen que hay que traducir, con sus idiomas (como list_md_files)
+def changed_md_files(content_index, changed):
+    sources = []
+    for path in sorted(changed):
+        try:
+            content_index.add_file(path, os.stat(path).st_mtime)
+        except FileNotFoundError:
+            content_index.remove_file(path)
+            continue
+        if content_index.has_source(path):
+            sources.append(path)
+
+    md_files = []
+    for file_path in sources:
+        mtime = content_index.sources[file_path]
+        file_languages = [lang for lang in output_languages
+                          if not content_index.has_translation(file_path, lang)
+                          or manifest.is_outdated(file_path, file_path.with_suffix(f'.{lang}.md'), lang, mtime,
+                                                  content_index.translations[file_path][lang])]
+        if file_languages:
+            md_files.append((file_path, file_languages))
+    return md_files
+
+# Función para traducir los archivos que cambian mientras el script sigue en marcha (--watch)
+# El motor de traducción, la memoria de traducción, el manifiesto y el índice de contenido se mantienen en
+# memoria entre cambios; tras cada guardado solo se traduce el archivo que ha cambiado
+def watch_files(content_index):
+    watcher = ContentWatcher(input_directory, watch_debounce, watch_poll_interval)
+    print(f"Vigilando {input_directory} ({watcher.method()}), pulsa Ctrl+C para terminar")
+
+    try:
+        for changed in watcher.changes():
+            md_files = changed_md_files(content_index, changed)
+            if not md_files:
+                continue
+
+            start = time.perf_counter()
+            try:
+                translate_files(md_files)
+            finally:
+                manifest.save()
+                journal.compact()
+            print(f"{len(md_files)} archivo(s) traducido(s) en {time.perf_counter() - start:.1f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Traduce los archivos Markdown de input_directory con LibreTranslate")
+    parser.add_argument('--plan', action='store_true',
+                        help="Mostrar lo que se traduciría y cuánto tardaría, sin llamar al servidor")
+    parser.add_argument('--watch', action='store_true',
+                        help="Tras traducir los archivos pendientes, seguir vigilando y traducir cada archivo que se guarde")
+    args = parser.parse_args()
+
+    setup(connect=not args.plan)
+
+    # Recorrer el árbol de contenido una sola vez
+    with stage(metrics, 'scan') as fields:
+        content_index = scan_content(input_directory, languages)
+        fields['sources'] = len(content_index.sources)
+
+    # Lista de archivos .md, excluyendo los que ya están traducidos
+    with stage(metrics, 'list') as fields:
+        md_files = list_md_files(content_index, output_languages)
+        fields['pending'] = len(md_files)
+
+    # print(f"Lista bruta: {sorted(content_index.sources)}")
+    # print(f"Lista neta: {md_files}")
+
+    # Estadísticas de archivos
+    file_count = count_files_by_language(content_index, languages, md_files)
+
+    # Mostrar estadísticas de archivos
+    print(f"Estadísticas de archivos:")
+    for lang, counts in file_count.items():
+        print(f"Idioma: {lang}")
+        print(f"  Total archivos: {counts['total']}")
+        print(f"  Archivos traducidos: {counts['translated']}")
+        print(f"  Archivos pendientes de traducir: {counts['pending']} "
+              f"({counts['missing']} sin traducción, {counts['outdated']} desactualizados)")
+
+    if args.plan:
+        plan_files(md_files)
+        close()
+        return
+
+    # Ejecutar el script
+    print(f"Comenzando traducción de {input_language} a {', '.join(output_languages)}...")
+
+    # Traducir los archivos .md del directorio de entrada
+    try:
+        translate_files(md_files, content_index)
+    finally:
+        with stage(metrics, 'save'):
+            manifest.save()
+            journal.compact()
+
+    if args.watch:
+        watch_files(content_index)
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Memoria de traducción: {stats['hits']} aciertos, {stats['misses']} fallos, {stats['entries']} entradas")
+    metrics.print_summary()
+
+    close()
+    print(f"Traducción completada.")
+
+if __name__ == "__main__":
+    main()
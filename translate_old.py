@@ -1,13 +1,15 @@
-import json
 from pathlib import Path
+import io
 import re
-import requests
 import frontmatter  # pip install python-frontmatter
+from backends import TranslationError, create_backend
+from writer import write_if_changed
 
 # VARIABLES
 input_language = 'es'
 output_language = 'en'
 url = "http://localhost:5000/translate"
+backend_name = 'http'  # translation backend: 'http' (LibreTranslate at url), 'argos' (in-process models) or 'stub'
 input_directory = Path('/home/javiercruces/Documentos/test')
 
 # SUBROUTINES
@@ -29,34 +31,15 @@ def postprocess_text(translated_text, placeholders):
         translated_text = translated_text.replace(placeholder, f'```{original_text}```')
     return translated_text
 
-# function to translate text using LibreTranslate API
+# shared translation backend (see backends.py); the LibreTranslate client keeps a keep-alive connection pool
+backend = create_backend(backend_name, url)
+
+# function to translate text with the backend, keeping the original text if it fails
 def translate_text(text, input_language, output_language):
-    # Si el texto está vacío, no se hace la petición y se devuelve el texto vacío
-    if not text.strip():
-        return text
-    
-    # build Json payload to send to LibreTranslate API
-    payload = {
-        "q": text,
-        "source": input_language,
-        "target": output_language,
-        "format": "html",
-        "api_key": ""
-    }
-    headers = {"Content-Type": "application/json"}
-
-    # send payload to LibreTranslate API
-    response = requests.post(url, data=json.dumps(payload), headers=headers)
-    
-    # Verificar la respuesta de la API
-    if response.status_code == 200:
-        return response.json()['translatedText']
-    else:
-        # Imprimir detalles de error y lo enviado
-        print(f"Error with translation: {response.text}")
-        print(f"Error with status code: {response.status_code}")
-        print(f"Payload sent: {json.dumps(payload, indent=2)}")
-        print(f"Headers sent: {json.dumps(headers, indent=2)}")
+    try:
+        return backend.translate_text(text, input_language, output_language)
+    except TranslationError as error:
+        print(f"Error with translation: {error}")
         return text
 
 # Function to check if a line starts with ![](
@@ -95,8 +78,8 @@ for file_path in Path(input_directory).rglob("*.md"):
         # Write the modified file back (only metadata changes)
         write_file_path = file_path.with_name(file_path.stem + '.en.md')
         print(f"Writing translated _index.md file to: {write_file_path}")
-        with open(write_file_path, 'w') as f:
-            f.write(frontmatter.dumps(text))
+        if not write_if_changed(write_file_path, frontmatter.dumps(text)):
+            print(f"Translated file unchanged: {write_file_path}")
     
     else:
         # For non _index.md files, process the full content as usual
@@ -154,32 +137,24 @@ for file_path in Path(input_directory).rglob("*.md"):
         write_file_path = file_path.with_name(file_path.stem + '.en.md')
         print(f"Writing translated file to: {write_file_path}")
 
+        # Build the final file in memory, split into lines as reading it back in text mode would,
+        # and write it once (atomically, and only if it changed)
+        content = io.StringIO(frontmatter.dumps(text).lstrip("\ufeff"), newline=None).readlines()  # Remove unwanted BOM characters
+
+        # Correct the titles by removing spaces between '#' and the title
+        corrected_content = []
+        for line in content:
+            if line.lstrip().startswith("#"):  # Check if line is a header
+                # Remove any space between '#' symbols and the title
+                line = line.replace(" #", "#")  # Remove space between '#' symbols
+            corrected_content.append(line)
+
+        # Now, remove the first 5 lines and insert the '---'
+        corrected_content = corrected_content[5:]  # Remove the first 5 lines
+        corrected_content.insert(0, "---\n")  # Add the line with ---
+
         # Write new Markdown file in the same directory as the original
-        with open(write_file_path, 'w', encoding='utf-8') as f:
-            f.write(frontmatter.dumps(text).lstrip("\ufeff"))  # Remove unwanted BOM characters
-
-        # Now correct the titles in the file by removing the space after the '#'
-        with open(write_file_path, 'r+', encoding='utf-8') as f:
-            content = f.readlines()
-
-            # Correct the titles by removing spaces between '#' and the title
-            corrected_content = []
-            for line in content:
-                if line.lstrip().startswith("#"):  # Check if line is a header
-                    # Remove any space between '#' symbols and the title
-                    line = line.replace(" #", "#")  # Remove space between '#' symbols
-                corrected_content.append(line)
-
-            # Rewind and write the corrected content
-            f.seek(0)
-            f.truncate()  # Clear the file content
-            f.writelines(corrected_content)  # Write the corrected lines back
-
-            # Now, remove the first 5 lines and insert the '---'
-            corrected_content = corrected_content[5:]  # Remove the first 5 lines
-            corrected_content.insert(0, "---\n")  # Add the line with ---
-            f.seek(0)  # Go back to the beginning of the file
-            f.truncate()  # Clear the file content
-            f.writelines(corrected_content)  # Write the remaining lines back
+        if not write_if_changed(write_file_path, "".join(corrected_content)):
+            print(f"Translated file unchanged: {write_file_path}")
 
     print(f"Translation completed.")
\ No newline at end of file
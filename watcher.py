@@ -0,0 +1,111 @@
+import os
+import queue
+import threading
+from pathlib import Path
+
+# watchdog es opcional: si está instalado se usan los avisos del sistema (inotify en Linux) y si
+# no se recorre el directorio cada cierto tiempo
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+WATCHDOG = Observer is not None  # Si se pueden recibir avisos de cambios sin recorrer el directorio
+
+# Eventos de watchdog que no cambian el archivo (abrirlo o cerrarlo tras leerlo)
+READ_EVENTS = ('opened', 'closed_no_write')
+
+# Manejador de watchdog que pasa a la cola las rutas de los archivos .md que cambian
+class MarkdownEventHandler(FileSystemEventHandler):
+    def __init__(self, events):
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type in READ_EVENTS:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and str(path).endswith('.md'):
+                self.events.put(Path(os.fsdecode(path)))
+
+# Vigilante de los archivos .md de un árbol de contenido
+# changes() devuelve los archivos que han cambiado (creados, modificados, movidos o borrados) en
+# grupos: tras un cambio espera a que pasen debounce segundos sin cambios nuevos, para que un
+# guardado que escribe el archivo varias veces se traduzca una sola vez
+class ContentWatcher:
+    def __init__(self, root, debounce=1.0, poll_interval=2.0, use_watchdog=True):
+        self.root = Path(root)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.observer = None
+
+        if use_watchdog and Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(MarkdownEventHandler(self.events), str(self.root), recursive=True)
+            self.observer.start()
+        else:
+            threading.Thread(target=self._poll_loop, name="content-watcher", daemon=True).start()
+
+    # Función para saber qué mecanismo se usa para detectar los cambios
+    def method(self):
+        return "watchdog" if self.observer is not None else f"sondeo cada {self.poll_interval}s"
+
+    # Función que genera los grupos de archivos que han cambiado, hasta llamar a stop()
+    def changes(self):
+        while not self.stopped.is_set():
+            try:
+                changed = {self.events.get(timeout=0.5)}
+            except queue.Empty:
+                continue
+
+            # Seguir recogiendo cambios hasta que pasen debounce segundos sin ninguno
+            while True:
+                try:
+                    changed.add(self.events.get(timeout=self.debounce))
+                except queue.Empty:
+                    break
+            yield changed
+
+    # Función para obtener, sin esperar, los archivos que han cambiado desde la última llamada
+    def drain(self):
+        changed = set()
+        while True:
+            try:
+                changed.add(self.events.get_nowait())
+            except queue.Empty:
+                return changed
+
+    # Función para recorrer el árbol y obtener el mtime de cada archivo .md
+    def _snapshot(self):
+        files = {}
+        pending = [self.root]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.name.endswith('.md'):
+                            files[Path(entry.path)] = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue  # Carpeta borrada mientras se recorría
+        return files
+
+    # Función que compara el árbol cada poll_interval segundos cuando no hay watchdog
+    def _poll_loop(self):
+        previous = self._snapshot()
+        while not self.stopped.wait(self.poll_interval):
+            current = self._snapshot()
+            for path in current.keys() | previous.keys():
+                if current.get(path) != previous.get(path):
+                    self.events.put(path)
+            previous = current
+
+    def stop(self):
+        self.stopped.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
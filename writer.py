@@ -0,0 +1,39 @@
+import hashlib
+import os
+from hashes import file_hash
+
+# Escritura de los archivos traducidos
+# Cada archivo se escribe en un temporal junto al de destino y se coloca en su sitio con os.replace,
+# así Hugo o la sincronización nunca ven un archivo a medias. Si el contenido nuevo es igual al del
+# archivo existente no se toca, para que su mtime solo cambie cuando cambia la traducción
+
+# Función para saber si un archivo ya tiene un contenido, dado su tamaño en bytes y su hash SHA-256
+# Solo se calcula el hash del archivo si el tamaño coincide
+def same_content(path, size, content_hash):
+    try:
+        return os.path.getsize(path) == size and file_hash(path) == content_hash
+    except FileNotFoundError:
+        return False
+
+# Función para sustituir un archivo por un temporal ya escrito cuyo hash es content_hash
+# Si el contenido no cambia se borra el temporal y el archivo se deja como estaba.
+# Devuelve True si el archivo ha cambiado
+def replace_if_changed(temp_path, path, content_hash):
+    if same_content(path, os.path.getsize(temp_path), content_hash):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, path)
+    return True
+
+# Función para escribir un texto en un archivo de forma atómica, solo si su contenido cambia
+# Devuelve True si el archivo ha cambiado
+def write_if_changed(path, content, encoding='utf-8'):
+    data = content.encode(encoding)
+    if same_content(path, len(data), hashlib.sha256(data).hexdigest()):
+        return False
+
+    temp_path = os.fspath(path) + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, path)
+    return True